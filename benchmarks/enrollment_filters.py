@@ -0,0 +1,98 @@
+"""
+Compara a filtragem de inscrições no servidor com a filtragem local do modo
+"Filtro local (memória)" do painel administrativo.
+
+Uso (a partir da raiz do repositório):
+
+    python benchmarks/enrollment_filters.py --enrollments 50000 --latency-ms 30
+
+Para cada combinação de filtros, mede o tempo de uma consulta `GET /enrollment/`
+à API falsa (mais a montagem do DataFrame) e o do filtro vetorizado sobre o
+DataFrame compacto, e reporta a memória do DataFrame com tipos padrão e compactos.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_DIR = ROOT / 'frontend_dlpl'
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_api import MockApi  # noqa: E402
+
+FILTERS = [
+    {},
+    {'query_escolha': 'Cursar disciplina'},
+    {'query_turma': 'Turma A', 'query_escolha': 'Dispensa de disciplina'},
+    {'query_nome': 'ALUNO 0001'},
+    {'query_nome': 'ALUNO 00', 'query_turma': 'Turma B'},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--enrollments', type=int, default=20000)
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--repeat', type=int, default=5, help='repetições de cada filtro')
+    args = parser.parse_args()
+
+    api = MockApi(latency_ms=args.latency_ms, enrollments=args.enrollments).start()
+    sys.path.insert(0, str(APP_DIR))
+    import pandas as pd
+    from utils import api_client
+    from utils.dataset import EnrollmentDataset
+
+    def server_query(params):
+        response = api_client.get(f'{api.url}/enrollment/', params=params)
+        response.raise_for_status()
+        return pd.DataFrame(response.json().get('data', []))
+
+    load_start = time.perf_counter()
+    enrollments = EnrollmentDataset(server_query({}).to_dict('records'))
+    load_seconds = time.perf_counter() - load_start
+
+    rows = []
+    for params in FILTERS:
+        server_times, local_times = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            server_df = server_query(params)
+            server_times.append(time.perf_counter() - start)
+            local_df, seconds = enrollments.filter(
+                nome=params.get('query_nome'), turma=params.get('query_turma'), escolha=params.get('query_escolha')
+            )
+            local_times.append(seconds)
+        assert len(server_df) == len(local_df), (params, len(server_df), len(local_df))
+        rows.append(
+            {
+                'filters': params,
+                'rows': len(local_df),
+                'server_ms': round(1000 * statistics.median(server_times), 2),
+                'local_ms': round(1000 * statistics.median(local_times), 2),
+            }
+        )
+    api.stop()
+
+    print(
+        json.dumps(
+            {
+                'enrollments': args.enrollments,
+                'latency_ms': args.latency_ms,
+                'load_seconds': round(load_seconds, 3),
+                'memory_bytes': {'object_dtypes': enrollments.object_bytes, 'compact': enrollments.memory_bytes},
+                'filters': rows,
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+
+
+if __name__ == '__main__':
+    os.chdir(ROOT)
+    main()
@@ -0,0 +1,278 @@
+"""
+Teste de carga com sessões simultâneas de alunos e administradores.
+
+Sobe a API falsa de `mock_api.py` dentro do processo e executa, com o `AppTest`
+do Streamlit, N sessões de inscrição e M sessões administrativas em paralelo.
+Cada fase reporta os percentis de latência dos reruns, as chamadas à API por
+sessão e a memória retida por sessão, e o resultado é salvo em JSON.
+
+Uso (a partir da raiz do repositório):
+
+    python benchmarks/load_test.py --students 50 --admins 5 --latency-ms 50 --output bench.json
+    python benchmarks/load_test.py --students 50 --compare bench.json
+
+A memória por sessão é medida com `tracemalloc` e inclui o overhead do próprio
+`AppTest`; serve para comparar execuções, não como valor absoluto. Como o
+`tracemalloc` deixa tudo mais lento, use `--no-memory` para medir só latência.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_DIR = ROOT / 'frontend_dlpl'
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_api import MockApi  # noqa: E402
+
+
+def pin_streamlit_runtime():
+    """
+    Prepara o `AppTest` para rodar várias sessões em paralelo no mesmo processo.
+
+    A cada `run()` o `AppTest` instala um `Runtime` simulado global, sobrescreve
+    `config.get_option` e desfaz as duas coisas ao final, derrubando as sessões
+    que ainda estão rodando em outras threads. Aqui um único runtime (com um
+    único armazenamento de `st.cache_data`, como em produção) e a configuração
+    de teste ficam fixos durante todo o benchmark.
+
+    Cada `AppTest` compila o script por conta própria, e o `ast.parse` do
+    CPython 3.11 falha às vezes quando chamado de várias threads ao mesmo
+    tempo; a compilação é serializada (no servidor ela acontece uma vez só).
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import script_cache
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+    class PinnedRuntimeMeta(type):
+        def __setattr__(cls, name, value):
+            if name != '_instance':
+                super().__setattr__(name, value)
+
+    app_test.Runtime = PinnedRuntimeMeta('Runtime', (Runtime,), {})
+    app_test.patch_config_options = lambda overrides: nullcontext()
+    config.get_option = build_mock_config_get_option({'global.appTest': True})
+
+    compile_lock = threading.Lock()
+    get_bytecode = script_cache.ScriptCache.get_bytecode
+
+    def get_bytecode_serialized(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    script_cache.ScriptCache.get_bytecode = get_bytecode_serialized
+
+
+class SessionRecorder:
+    """Cronometra cada rerun de uma sessão do `AppTest`."""
+
+    def __init__(self, at):
+        self.at = at
+        self.latencies = []
+        self.errors = []
+
+    def run(self, element=None):
+        start = time.perf_counter()
+        (element or self.at).run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            self.errors.append(self.at.exception[0].message)
+        return self.at
+
+
+def find(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+def student_cpf(index):
+    """CPF válido e diferente para cada aluno simulado, para que os envios não sejam tratados como repetidos."""
+    digits = [int(digit) for digit in f'{zlib.crc32(str(index).encode()) % 10**9:09d}']
+    for position in (9, 10):
+        total = sum(number * (position + 1 - i) for i, number in enumerate(digits))
+        digits.append(total * 10 % 11 % 10)
+    cpf = ''.join(map(str, digits))
+    return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+
+
+def student_session(index, api):
+    from streamlit.testing.v1 import AppTest
+
+    session = SessionRecorder(AppTest.from_file(str(APP_DIR / 'pages/01_enrollment.py'), default_timeout=60))
+    at = session.run()
+    at.text_input[0].input(f'Aluno {index}')
+    at.text_input[1].input(student_cpf(index))
+    at = session.run(find(at.button, 'Verificar').click())
+
+    for course in api.courses[1:]:
+        at = session.run(find(at.selectbox, 'Selecione seu curso').set_value(course))
+    session.run(find(at.button, 'Finalizar Inscrição').click())
+    return session
+
+
+def admin_session(index, api):
+    from streamlit.testing.v1 import AppTest
+
+    session = SessionRecorder(AppTest.from_file(str(APP_DIR / 'pages/02_admin.py'), default_timeout=60))
+    at = session.run()
+    at.text_input[0].input(f'admin{index}')
+    at.text_input[1].input('senha')
+    at = session.run(find(at.button, 'Entrar').click())
+
+    for choice in ['Cursar disciplina', 'Dispensa de disciplina', 'Todos']:
+        at = session.run(find(at.selectbox, 'Filtrar por escolha').set_value(choice))
+    at = session.run(find(at.text_input, 'Filtrar por nome do aluno').input('ALUNO 0001'))
+    for section in ['👤 Gerenciar Usuários', '📚 Gerenciar Turmas', '⚙️ Configurações', '📊 Gerenciar Inscrições']:
+        at = session.run(at.radio(key='admin_section').set_value(section))
+    return session
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_phase(name, scenario, sessions, api, trace_memory=True):
+    """
+    Executa `sessions` sessões do cenário em paralelo e resume as métricas.
+
+    Uma sessão de aquecimento roda antes, fora da medição, para que a importação
+    dos módulos e os caches do processo não entrem na conta, como em um
+    servidor que já está no ar.
+    """
+    if not sessions:
+        return None
+    scenario('warmup', api)
+    api.reset_calls()
+    if trace_memory:
+        tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [pool.submit(scenario, index, api) for index in range(sessions)]
+        results = []
+        failures = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append(repr(e))
+    wall = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    latencies_ms = [1000 * latency for session in results for latency in session.latencies]
+    total_calls = sum(api.calls.values())
+    return {
+        'phase': name,
+        'sessions': sessions,
+        'completed_sessions': len(results),
+        'failed_sessions': failures,
+        'script_errors': sorted({error for session in results for error in session.errors}),
+        'wall_seconds': round(wall, 3),
+        'reruns': len(latencies_ms),
+        'rerun_latency_ms': {
+            'p50': round(percentile(latencies_ms, 50), 1),
+            'p90': round(percentile(latencies_ms, 90), 1),
+            'p95': round(percentile(latencies_ms, 95), 1),
+            'p99': round(percentile(latencies_ms, 99), 1),
+            'max': round(max(latencies_ms, default=0), 1),
+            'mean': round(statistics.fmean(latencies_ms), 1) if latencies_ms else 0.0,
+        },
+        'api_calls_per_session': round(total_calls / sessions, 2),
+        'api_calls_by_endpoint': dict(api.calls.most_common()),
+        'retained_bytes_per_session': int(retained / sessions) if trace_memory else None,
+    }
+
+
+def compare(current, previous):
+    """Imprime a variação das principais métricas em relação a uma execução anterior."""
+    previous_phases = {phase['phase']: phase for phase in previous.get('phases', [])}
+    for phase in current['phases']:
+        old = previous_phases.get(phase['phase'])
+        if not old:
+            continue
+        print(f"\n== {phase['phase']} (atual vs. anterior)")
+        rows = [
+            ('p50 ms', phase['rerun_latency_ms']['p50'], old['rerun_latency_ms']['p50']),
+            ('p95 ms', phase['rerun_latency_ms']['p95'], old['rerun_latency_ms']['p95']),
+            ('p99 ms', phase['rerun_latency_ms']['p99'], old['rerun_latency_ms']['p99']),
+            ('chamadas/sessão', phase['api_calls_per_session'], old['api_calls_per_session']),
+            ('bytes/sessão', phase['retained_bytes_per_session'], old['retained_bytes_per_session']),
+        ]
+        for label, new_value, old_value in rows:
+            delta = f'{100 * (new_value - old_value) / old_value:+.1f}%' if new_value is not None and old_value else 'n/a'
+            print(f'{label:>18}: {str(new_value):>12} {str(old_value):>12} {delta:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=20, help='sessões simultâneas de inscrição')
+    parser.add_argument('--admins', type=int, default=3, help='sessões administrativas simultâneas')
+    parser.add_argument('--latency-ms', type=float, default=30, help='latência de cada chamada à API falsa')
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--enrollments', type=int, default=5000, help='inscrições retornadas pela API falsa')
+    parser.add_argument('--courses', type=int, default=3, help='cursos por aluno')
+    parser.add_argument('--no-memory', action='store_true', help='não mede memória (latências mais fiéis)')
+    parser.add_argument('--output', help='arquivo JSON para salvar o resultado')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args()
+
+    api = MockApi(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        enrollments=args.enrollments,
+        courses=args.courses,
+    ).start()
+    os.environ['API_URL'] = api.url
+    os.chdir(ROOT)
+    sys.path.insert(0, str(APP_DIR))
+    pin_streamlit_runtime()
+
+    phases = [
+        run_phase('students', student_session, args.students, api, not args.no_memory),
+        run_phase('admins', admin_session, args.admins, api, not args.no_memory),
+    ]
+    api.stop()
+
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'threads': threading.active_count(),
+        'config': vars(args),
+        'phases': [phase for phase in phases if phase],
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.compare:
+        compare(result, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""
+Substituto local da API do DLPL, para benchmarks e testes de carga.
+
+Implementa todos os endpoints chamados pelas páginas de inscrição e de
+administração, com latência e volume de dados configuráveis. Pode ser usado
+dentro do processo (`MockApi(...).start()`) ou rodando sozinho:
+
+    python benchmarks/mock_api.py --port 8000 --latency-ms 50 --enrollments 20000
+
+e depois `API_URL=http://127.0.0.1:8000 streamlit run frontend_dlpl/home.py`.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CHOICES = ['Cursar disciplina', 'Dispensa de disciplina']
+
+
+class MockApi:
+    """Estado e configuração do servidor falso. `calls` conta as chamadas por 'MÉTODO caminho'."""
+
+    def __init__(
+        self,
+        latency_ms=0,
+        jitter_ms=0,
+        enrollments=1000,
+        courses=3,
+        turmas=4,
+        users=20,
+        seed=42,
+        delta_sync=True,
+        etags=True,
+        token_ttl=None,
+        refresh=True,
+        aggregates=False,
+    ):
+        self.latency_ms = latency_ms
+        # Oferece `GET /enrollment/aggregates` (agregados calculados no servidor)
+        self.aggregates = aggregates
+        # Validade dos tokens de administrador em segundos (`None`: não expiram)
+        self.token_ttl = token_ttl
+        self.refresh = refresh
+        self.tokens = {}
+        # Atraso extra (segundos) e endpoints fora do ar (503), alteráveis durante o teste
+        self.path_delays = {}
+        self.down = set()
+        self.delta_sync = delta_sync
+        self.etags = etags
+        self.jitter_ms = jitter_ms
+        self.courses = [f'Curso {i + 1}' for i in range(courses)]
+        self.turmas = [{'name': f'Turma {chr(65 + i)}', 'semester': '2025.2', 'is_active': True} for i in range(turmas)]
+        self.users = [{'name': f'admin{i}', 'is_active': True, 'admin': i == 0} for i in range(users)]
+        self.config = {
+            'activeSemester': '2025.2',
+            'enrollmentStartDate': '2025-08-01T08:00:00',
+            'enrollmentEndDate': '2025-08-15T18:00:00',
+            'cutoffScore': 6.75,
+        }
+        rng = self._rng = random.Random(seed)
+        self.enrollments = [
+            {
+                'id': i,
+                'nome': f'ALUNO {i:06d}',
+                'cpf': f'{i:011d}',
+                'curso': rng.choice(self.courses),
+                'semestre': '2025.2',
+                'turma': rng.choice(self.turmas)['name'],
+                'escolha': rng.choice(CHOICES),
+                'nota_predita': round(rng.uniform(0, 10), 2),
+            }
+            for i in range(enrollments)
+        ]
+        # Versão de cada inscrição, para a sincronização incremental (`updated_since`)
+        self.version = 0
+        self.oldest_cursor = 0
+        self.row_versions = [0] * len(self.enrollments)
+        self.deleted = {}
+        self.calls = Counter()
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self, host='127.0.0.1', port=0):
+        handler = type('Handler', (_Handler,), {'api': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+            self.not_modified = 0
+
+    def record(self, method, path, status=None):
+        with self._lock:
+            self.calls[f'{method} {path}'] += 1
+            if status == 304:
+                self.not_modified += 1
+
+    def wait(self, path=None):
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        delay += 1000 * self.path_delays.get(path, 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def touch(self, count):
+        """Altera `count` inscrições aleatórias, como se alunos tivessem refeito a escolha."""
+        with self._lock:
+            self.version += 1
+            for index in self._rng.sample(range(len(self.enrollments)), count):
+                row = self.enrollments[index]
+                row['escolha'] = CHOICES[1 - CHOICES.index(row['escolha'])]
+                self.row_versions[index] = self.version
+
+    def changes_since(self, cursor, query):
+        versions = dict(zip((r['id'] for r in self.enrollments), self.row_versions))
+        rows = [r for r in self.filter_enrollments(query) if versions[r['id']] > cursor]
+        deleted = [key for key, version in self.deleted.items() if version > cursor]
+        return {'data': rows, 'deleted': deleted, 'sync_cursor': str(self.version)}
+
+    def issue_token(self):
+        with self._lock:
+            token = f'mock-token-{len(self.tokens) + 1}'
+            self.tokens[token] = time.monotonic()
+        return token
+
+    def expire_tokens(self):
+        """Invalida todos os tokens emitidos, como se tivessem expirado."""
+        with self._lock:
+            self.tokens = {token: float('-inf') for token in self.tokens}
+
+    def authorized(self, header):
+        """Só chamadas com `Authorization` são conferidas; as da página de inscrição não o enviam."""
+        if not header:
+            return True
+        issued = self.tokens.get(header.removeprefix('Bearer '))
+        if issued is None:
+            return False
+        if self.token_ttl is None:
+            return issued != float('-inf')
+        return time.monotonic() - issued < self.token_ttl
+
+    # --- ENDPOINTS ---
+    def filter_enrollments(self, query):
+        rows = self.enrollments
+        if name := query.get('query_nome'):
+            rows = [r for r in rows if name.upper() in r['nome']]
+        for param, field in (('query_semestre', 'semestre'), ('query_turma', 'turma'), ('query_escolha', 'escolha')):
+            if value := query.get(param):
+                rows = [r for r in rows if r[field] == value]
+        return rows
+
+    def aggregate_enrollments(self, query):
+        edges = [float(edge) for edge in query.get('grade_bands', '0,5,6,7,8,9,10').split(',')]
+        counts = Counter()
+        for row in self.filter_enrollments(query):
+            grade = row.get('nota_predita')
+            band = 'Sem nota'
+            for low, high in zip(edges, edges[1:]):
+                if grade is not None and (low <= grade < high or (high == edges[-1] and grade == high)):
+                    band = f'{low:g}–{high:g}'
+                    break
+            counts[(row['turma'], row['escolha'], band)] += 1
+        return [{'turma': t, 'escolha': e, 'faixa_nota': b, 'total': n} for (t, e, b), n in counts.items()]
+
+    def get(self, path, query):
+        if path == '/enrollment/verify-cpf-by-name':
+            return 200, {'message': 'ok'}
+        if path == '/enrollment/courses':
+            return 200, {'courses': self.courses}
+        if path == '/enrollment/entry-info':
+            return 200, {'NOTA_PREDITA': 7.5, 'OPCOES': CHOICES}
+        if path == '/turma/active':
+            return 200, {'turmas': self.turmas, 'active_semester': self.config['activeSemester']}
+        if path == '/turma/semesters':
+            return 200, {'semesters': sorted({t['semester'] for t in self.turmas})}
+        if path == '/turma/':
+            return 200, {'turmas': self.turmas}
+        if path == '/users/':
+            return 200, {'users': self.users}
+        if path == '/config/':
+            return 200, self.config
+        if path == '/enrollment/aggregates' and self.aggregates:
+            return 200, {'groups': self.aggregate_enrollments(query)}
+        if path == '/enrollment/':
+            if self.delta_sync and 'updated_since' in query:
+                cursor = query['updated_since']
+                if not cursor.isdigit() or int(cursor) < self.oldest_cursor:
+                    return 410, {'detail': 'Cursor expirado'}
+                return 200, self.changes_since(int(cursor), query)
+            rows = self.filter_enrollments(query)
+            if 'limit' not in query:
+                return 200, {'data': rows, **({'sync_cursor': str(self.version)} if self.delta_sync else {})}
+            sort_by = query.get('sort_by') or 'nome'
+            rows = sorted(rows, key=lambda r: str(r.get(sort_by, '')))
+            offset, limit = int(query.get('offset', 0)), int(query['limit'])
+            return 200, {'data': rows[offset:offset + limit], 'total': len(rows)}
+        return 404, {'detail': 'Not Found'}
+
+    def write(self, method, path, body):
+        if (method, path) == ('POST', '/users/login'):
+            return 200, {'token': self.issue_token()}
+        if (method, path) == ('POST', '/users/refresh') and self.refresh:
+            return 200, {'token': self.issue_token()}
+        if (method, path) == ('POST', '/enrollment/'):
+            return 201, {'message': 'Inscrição realizada'}
+        if path in ('/users/', '/users/update-active', '/users/update-admin', '/users/bulk-update', '/turma/', '/config/'):
+            return 200, {'message': 'ok'}
+        return 404, {'detail': 'Not Found'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    api = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.api.wait(url.path)
+        if url.path in self.api.down:
+            self.api.record('GET', url.path, status=503)
+            self._send(503, {'detail': 'Service Unavailable'})
+            return
+        if not self.api.authorized(self.headers.get('Authorization')):
+            self.api.record('GET', url.path, status=401)
+            self._send(401, {'detail': 'Token expirado'})
+            return
+        status, body = self.api.get(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+        if status == 200 and self.api.etags:
+            etag = '"%s"' % hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16]
+            if self.headers.get('If-None-Match') == etag:
+                self.api.record('GET', url.path, status=304)
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.api.record('GET', url.path)
+            self._send(status, body, {'ETag': etag})
+            return
+        self.api.record('GET', url.path)
+        self._send(status, body)
+
+    def _write(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.api.record(self.command, url.path)
+        self.api.wait(url.path)
+        if url.path in self.api.down:
+            self._send(503, {'detail': 'Service Unavailable'})
+            return
+        if url.path == '/users/refresh' and 'session-token=' not in self.headers.get('Cookie', ''):
+            self._send(401, {'detail': 'Sessão inválida'})
+            return
+        if url.path != '/users/refresh' and not self.api.authorized(self.headers.get('Authorization')):
+            self._send(401, {'detail': 'Token expirado'})
+            return
+        status, response = self.api.write(self.command, url.path, body)
+        headers = {'Set-Cookie': 'session-token=mock-session; Path=/'} if url.path == '/users/login' else None
+        self._send(status, response, headers)
+
+    do_POST = do_PUT = do_DELETE = _write
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--enrollments', type=int, default=1000)
+    parser.add_argument('--courses', type=int, default=3)
+    args = parser.parse_args()
+
+    api = MockApi(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, enrollments=args.enrollments, courses=args.courses
+    ).start(port=args.port)
+    print(f'API falsa em {api.url} (Ctrl+C para sair)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Substituto local de um servidor Redis, para testar o backend de cache
+compartilhado sem instalar o Redis. Entende só os comandos usados pelo
+`cache_backend` (PING, AUTH, SELECT, GET, SET com EX/PX, DEL, INCR, FLUSHDB).
+Pode ser usado dentro do processo (`MockRedis().start()`) ou rodando sozinho:
+
+    python benchmarks/mock_redis.py --port 6379
+
+e depois, em cada réplica, `CACHE_BACKEND_URL=redis://127.0.0.1:6379/0 streamlit run frontend_dlpl/home.py`.
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+from collections import Counter, defaultdict
+
+
+class MockRedis:
+    """Estado do servidor falso: um dicionário por banco. `commands` conta os comandos recebidos."""
+
+    def __init__(self, password=None):
+        self.password = password
+        self.databases = defaultdict(dict)
+        self.commands = Counter()
+        self.lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self, host='127.0.0.1', port=0):
+        handler = type('Handler', (_Handler,), {'redis': self})
+        self._server = socketserver.ThreadingTCPServer((host, port), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _live(self, db, key):
+        item = self.databases[db].get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self.databases[db][key]
+            return None
+        return item
+
+    def execute(self, db, command, args):
+        """Executa um comando e retorna a resposta já no formato RESP."""
+        with self.lock:
+            self.commands[command] += 1
+            if command == 'PING':
+                return b'+PONG\r\n'
+            if command == 'GET':
+                item = self._live(db, args[0])
+                return _bulk(item[0]) if item else b'$-1\r\n'
+            if command == 'SET':
+                expires = None
+                options = [arg.upper() for arg in args[2:]]
+                if 'PX' in options:
+                    expires = time.monotonic() + int(args[2 + options.index('PX') + 1]) / 1000
+                elif 'EX' in options:
+                    expires = time.monotonic() + int(args[2 + options.index('EX') + 1])
+                self.databases[db][args[0]] = (args[1], expires)
+                return b'+OK\r\n'
+            if command == 'DEL':
+                removed = sum(self.databases[db].pop(key, None) is not None for key in args)
+                return b':%d\r\n' % removed
+            if command == 'INCR':
+                item = self._live(db, args[0])
+                try:
+                    value = int(item[0]) + 1 if item else 1
+                except ValueError:
+                    return b'-ERR value is not an integer or out of range\r\n'
+                self.databases[db][args[0]] = (str(value), item[1] if item else None)
+                return b':%d\r\n' % value
+            if command == 'FLUSHDB':
+                self.databases[db].clear()
+                return b'+OK\r\n'
+        return f"-ERR unknown command '{command}'\r\n".encode()
+
+
+def _bulk(value):
+    data = value.encode()
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    redis = None
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Comando inline (ex.: `PING` digitado no telnet)
+            return line.decode().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        db = 0
+        authenticated = self.redis.password is None
+        while True:
+            args = self.read_command()
+            if not args:
+                return
+            command, args = args[0].upper(), args[1:]
+            if command == 'AUTH':
+                authenticated = args[-1] == self.redis.password
+                self.wfile.write(b'+OK\r\n' if authenticated else b'-WRONGPASS invalid password\r\n')
+            elif not authenticated:
+                self.wfile.write(b'-NOAUTH Authentication required.\r\n')
+            elif command == 'SELECT':
+                db = int(args[0])
+                self.wfile.write(b'+OK\r\n')
+            else:
+                self.wfile.write(self.redis.execute(db, command, args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    redis = MockRedis(password=args.password).start(port=args.port)
+    print(f'Redis falso em {redis.url} (Ctrl+C para sair)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        redis.stop()
+
+
+if __name__ == '__main__':
+    main()
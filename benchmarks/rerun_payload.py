@@ -0,0 +1,55 @@
+"""
+Mede quantos bytes de ForwardMsg cada página envia ao navegador por rerun.
+
+Uso (a partir da raiz do repositório):
+
+    python benchmarks/rerun_payload.py
+
+Cada página é executada duas vezes com o `AppTest` do Streamlit (primeira
+execução e um rerun) e o tamanho serializado das mensagens é somado.
+A API não precisa estar no ar: as chamadas falham rápido e a medição cobre
+apenas o que é enviado pela página em si (CSS, logo, formulários).
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_DIR = ROOT / 'frontend_dlpl'
+PAGES = ['pages/01_enrollment.py', 'pages/02_admin.py']
+
+
+def measure_page(page):
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    sizes = []
+    original = LocalScriptRunner.forward_msgs
+
+    def forward_msgs(self):
+        msgs = original(self)
+        sizes.append(sum(msg.ByteSize() for msg in msgs))
+        return msgs
+
+    LocalScriptRunner.forward_msgs = forward_msgs
+    try:
+        at = AppTest.from_file(str(APP_DIR / page), default_timeout=30)
+        at.run()
+        at.run()
+    finally:
+        LocalScriptRunner.forward_msgs = original
+    return {'first_run_bytes': sizes[0], 'rerun_bytes': sizes[-1]}
+
+
+def main():
+    os.chdir(ROOT)
+    os.environ.setdefault('API_URL', 'http://127.0.0.1:9')
+    sys.path.insert(0, str(APP_DIR))
+    results = {page: measure_page(page) for page in PAGES}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,17 @@
-import base64
-import re
 import time
+from functools import partial
 from os import getenv
-from pathlib import Path
 
 import requests
 import streamlit as st
 from dotenv import load_dotenv
-from unidecode import unidecode
-from utils.navigation import floating_reload_button
+from utils import api_client, concurrency, metrics, static_assets
+from utils.admission import AdmissionRejected, submission_gate, verification_gate
+from utils.circuit_breaker import CircuitOpen
+from utils.idempotency import submission_guard, submission_key
+from utils.navigation import floating_reload_button, timed_fragment
+from utils.shared_cache import public_cache
+from utils.validation import cpf_is_valid, format_cpf, normalize_cpf, normalize_name
 
 # --- CONFIGURAÇÃO INICIAL DA PÁGINA ---
 st.set_page_config(
@@ -19,109 +22,270 @@ st.set_page_config(
 floating_reload_button()
 load_dotenv()
 API_BASE_URL = getenv('API_URL', 'http://localhost:8000')
+# Máximo de cursos com informações de ingresso buscadas em paralelo por aluno
+ENTRY_INFO_PARALLELISM = int(getenv('ENTRY_INFO_PARALLELISM', '4'))
+
+
+# Por quanto tempo a resposta de uma verificação é reaproveitada na sessão (segundos)
+VERIFICATION_CACHE_TTL = float(getenv('VERIFICATION_CACHE_TTL', '300'))
 
 
 # --- FUNÇÕES HELPER ---
-def remover_numeros_e_acentos_unidecode(text):
-    """Limpa o texto, removendo números e acentos, e converte para maiúsculas."""
-    text_sem_numeros = re.sub(r'\d+', '', text)
-    text_limpa = unidecode(text_sem_numeros)
-    return text_limpa.upper()
+def fetch_json(endpoint, params=None):
+    """Faz um GET na API e retorna o JSON."""
+    response = api_client.get(f'{API_BASE_URL}{endpoint}', params=params)
+    response.raise_for_status()
+    return response.json()
 
 
-def load_image_as_base64(image_path):
-    """Carrega uma imagem local e a converte para base64 para embutir no app."""
-    try:
-        with Path(image_path).open('rb') as f:
-            return base64.b64encode(f.read()).decode()
-    except FileNotFoundError:
-        return None
+def fetch_entry_info(name, cpf, course):
+    return fetch_json('/enrollment/entry-info', {'name': name, 'cpf': cpf, 'course': course})
+
+
+def fetch_active_turmas():
+    """Turmas ativas e semestre: resposta pública, compartilhada entre todas as sessões do processo."""
+    return public_cache.get('/turma/active', partial(fetch_json, '/turma/active'))
+
+
+def store_active_turmas(data):
+    st.session_state.turmas = data.get('turmas', [])
+    st.session_state.semestre = [data.get('active_semester', 'N/A')]
 
 
-def load_css():
+def collect_entry_info(course=None):
     """
-    Carrega e injeta um CSS customizado que se adapta automaticamente
-    aos temas claro e escuro do Streamlit.
+    Move para `entry_info_<curso>` as respostas do prefetch que já chegaram.
+    Com `course`, espera a resposta desse curso se ela ainda estiver em andamento.
+    Falhas são descartadas: o formulário busca de novo e mostra o erro.
     """
-    st.markdown(
-        """
-    <style>
-        /* Remove a barra superior do Streamlit */
-        header {visibility: hidden;}
-
-        /* --- TIPOGRAFIA --- */
-        h1, h2, h3 { color: var(--text-color); }
-        h1 { font-weight: 600; padding-bottom: 1rem; text-align: center; }
-        h2 { font-weight: 600; text-align: center;}
-        h3 { font-weight: 500; opacity: 0.8; padding-bottom: 1rem; text-align: center;}
-
-        /* --- "CARDS" / CONTAINERS --- */
-        div[data-testid="stForm"] {
-            background-color: var(--secondary-background-color);
-            border: 1px solid var(--border-color, rgba(128,128,128,0.2));
-            border-radius: 18px;
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.04);
-            overflow: hidden;
-            margin-bottom: 1.5rem;
-        }
-        div[data-testid="stForm"] > form {
-            padding: 2rem 2.5rem;
-        }
-
-        /* --- WIDGETS (BOTÕES, INPUTS) --- */
-        .stButton > button {
-            border: none; border-radius: 12px; padding: 12px 24px;
-            font-weight: 600; font-size: 15px; color: white;
-            background-color: #4A7729; /* Verde do logo DLPL */
-            transition: all 0.2s ease-in-out;
-        }
-        .stButton > button:hover {
-            background-color: #3b6021;
-            transform: translateY(-2px);
-        }
-        .stButton > button:focus {
-            outline: none !important;
-            box-shadow: 0 0 0 3px rgba(74, 119, 41, 0.4);
-        }
-
-        /* Inputs de texto e Selectbox */
-        .stTextInput input, .stSelectbox div[data-baseweb="select"] > div {
-            border-radius: 12px !important;
-            border: 1px solid var(--border-color, rgba(128,128,128,0.2)) !important;
-            background-color: var(--background-color) !important;
-            font-size: 16px !important;
-        }
-        .stTextInput input:focus, .stSelectbox > div > div:focus-within {
-            border: 2px solid #4A7729 !important;
-            box-shadow: 0 0 0 3px rgba(74, 119, 41, 0.4) !important;
-        }
-
-        /* --- LOGO --- */
-        .logo-container {
-            display: flex; justify-content: center;
-            margin: 1rem 0 2rem 0;
-        }
-        .logo-img {
-            max-width: 150px; height: 150px;
-            filter: none !important; /* Impede que o tema escuro inverta as cores da logo */
-        }
-    </style>
-    """,
-        unsafe_allow_html=True,
+    futures = st.session_state.get('entry_info_futures', {})
+    for pending_course, future in list(futures.items()):
+        if pending_course == course or future.done():
+            del futures[pending_course]
+            try:
+                st.session_state[f'entry_info_{pending_course}'] = future.result()
+            except requests.exceptions.RequestException:
+                pass
+
+
+def prefetch_enrollment_data(name, cpf):
+    """
+    Busca em paralelo os dados da etapa 2 logo após a verificação: turmas ativas
+    com o semestre e os cursos do aluno. Em seguida dispara, em segundo plano e com
+    paralelismo limitado, as informações de ingresso de todos os cursos, esperando
+    apenas pela do primeiro. Falhas são ignoradas aqui: a etapa 2 busca de novo o
+    que ficar faltando e mostra o erro.
+    """
+    turmas_future = concurrency.submit(fetch_active_turmas)
+    courses_future = concurrency.submit(fetch_json, '/enrollment/courses', {'name': name, 'cpf': cpf})
+    try:
+        courses = courses_future.result().get('courses', [])
+    except requests.exceptions.RequestException:
+        courses = []
+    if courses:
+        st.session_state.courses = courses
+        st.session_state.entry_info_futures = concurrency.map_bounded(
+            partial(fetch_entry_info, name, cpf), courses, ENTRY_INFO_PARALLELISM
+        )
+        collect_entry_info(courses[0])
+    try:
+        store_active_turmas(turmas_future.result())
+    except requests.exceptions.RequestException:
+        pass
+
+
+def show_queue_position(placeholder, position, wait_seconds):
+    """Mostra ao aluno que aguarda no controle de admissão sua posição na fila e a espera estimada."""
+    placeholder.info(
+        f'Muitos alunos estão acessando agora. Você é o {position}º da fila; '
+        f'espera estimada: {max(wait_seconds, 1):.0f}s. Não feche esta página.'
     )
 
 
+def verify_student(name, cpf, on_wait=None):
+    """
+    Confere nome e CPF na API e retorna `None` se conferem ou a mensagem de erro.
+    Respostas definitivas (sucesso ou recusa da API) ficam guardadas na sessão,
+    para que reenviar os mesmos dados não repita a chamada. Falhas de conexão,
+    erros 5xx, 408 e 429 sobem como exceção e não são guardados.
+
+    A chamada passa pelo controle de admissão da verificação; `on_wait` recebe
+    a posição na fila enquanto o aluno espera.
+    """
+    results = st.session_state.setdefault('verification_results', {})
+    cached = results.get((name, cpf))
+    if cached and time.monotonic() - cached[1] < VERIFICATION_CACHE_TTL:
+        metrics.increment('verification_avoided', reason='cache_sessao')
+        return cached[0]
+
+    with verification_gate.admit(on_wait):
+        response = api_client.get(
+            f'{API_BASE_URL}/enrollment/verify-cpf-by-name',
+            params={'name': name, 'cpf': cpf},
+        )
+    if response.status_code >= 500 or response.status_code in (408, 429):
+        response.raise_for_status()
+    error = None
+    if not response.ok:
+        try:
+            error = f'Erro na verificação: {response.json()}'
+        except ValueError:
+            error = f'Erro na verificação: {response.text}'
+    results[(name, cpf)] = (error, time.monotonic())
+    return error
+
+
+def send_enrollment(payload, key, on_wait=None):
+    """Envia a inscrição pelo controle de admissão, com a chave de idempotência no cabeçalho."""
+    with submission_gate.admit(on_wait):
+        return api_client.post(f'{API_BASE_URL}/enrollment/', json=payload, headers={'Idempotency-Key': key})
+
+
+@timed_fragment('inscricao:verificacao')
+def display_verification_step():
+    st.title('Sistema de Inscrição')
+
+    with st.form(key='form_verification'):
+        st.header('Passo 1: Verificação de Dados')
+        name = st.text_input('Nome Completo', placeholder='Digite seu nome completo')
+        cpf = st.text_input('CPF', placeholder='Exemplo: 111.111.111-11')
+        submit_button = st.form_submit_button(label='Verificar',width='stretch')
+
+    if not submit_button:
+        return
+    if not name or not cpf:
+        st.error('Por favor, preencha o nome e o CPF.')
+        return
+
+    # Dados que a API recusaria são barrados aqui, sem gastar uma chamada
+    cleaned_name = normalize_name(name)
+    cpf_digits = normalize_cpf(cpf)
+    if not cleaned_name:
+        metrics.increment('verification_avoided', reason='nome_invalido')
+        st.error('Nome inválido: digite seu nome completo, sem números.')
+        return
+    if not cpf_is_valid(cpf_digits):
+        metrics.increment('verification_avoided', reason='cpf_invalido')
+        st.error('CPF inválido. Confira os números digitados.')
+        return
+    cpf = format_cpf(cpf_digits)
+
+    queue_notice = st.empty()
+    with st.spinner('Verificando seus dados...'):
+        try:
+            error = verify_student(cleaned_name, cpf, partial(show_queue_position, queue_notice))
+        except (AdmissionRejected, CircuitOpen) as e:
+            st.warning(str(e))
+            return
+        except requests.exceptions.RequestException as e:
+            st.error(f'Erro ao conectar com a API: {e}')
+            return
+        finally:
+            queue_notice.empty()
+    if error:
+        st.error(error)
+        return
+
+    st.session_state.is_verified = True
+    st.session_state.name = cleaned_name
+    st.session_state.cpf = cpf
+    prefetch_enrollment_data(cleaned_name, cpf)
+    st.rerun(scope='app')
+
+
+@timed_fragment('inscricao:selecao')
+def display_enrollment_step():
+    st.title('Finalize sua Inscrição')
+
+    if not st.session_state.courses:
+        with st.spinner('Buscando cursos...'):
+            try:
+                st.session_state.courses = fetch_json(
+                    '/enrollment/courses', {'name': st.session_state.name, 'cpf': st.session_state.cpf}
+                ).get('courses', [])
+            except requests.exceptions.RequestException:
+                st.error('Erro ao buscar cursos.')
+
+    if not st.session_state.courses:
+        st.warning('Nenhum curso disponível para você no momento.')
+        return
+
+    st.header('Passo 2: Seleção de Curso')
+    st.info(f'Bem-vindo(a), {st.session_state.name}!')
+
+    # Fora do formulário, para que trocar de curso atualize a nota e as opções
+    # (reexecutando só este fragmento)
+    selected_course = st.selectbox('Selecione seu curso', st.session_state.courses)
+
+    with st.form(key='form_enrollment'):
+        entry_info = None
+        selected_choice = None
+
+        # Lógica para buscar informações do curso e turmas
+        if selected_course:
+            session_key = f'entry_info_{selected_course}'
+            collect_entry_info(selected_course)
+            try:
+                if session_key not in st.session_state:
+                    st.session_state[session_key] = fetch_entry_info(
+                        st.session_state.name, st.session_state.cpf, selected_course
+                    )
+                if not st.session_state.turmas:
+                    store_active_turmas(fetch_active_turmas())
+            except requests.exceptions.RequestException as e:
+                st.error(f'Erro ao buscar informações: {e}')
+
+            entry_info = st.session_state.get(session_key)
+            if entry_info:
+                st.write(f"Sua Nota Predita: **{entry_info.get('NOTA_PREDITA', 'N/A')}**")
+                selected_choice = st.selectbox('Escolha uma opção', entry_info.get('OPCOES', []))
+
+        turma = st.selectbox('Turma', [t['name'] for t in st.session_state.get('turmas', [])])
+        semester = st.selectbox('Semestre', st.session_state.get('semestre', []), disabled=True)
+
+        submit_enrollment = st.form_submit_button('Finalizar Inscrição', width='stretch')
+
+        if submit_enrollment:
+            if not all([turma, semester, selected_choice]):
+                st.error('Por favor, selecione todas as opções.')
+            else:
+                queue_notice = st.empty()
+                with st.spinner('Finalizando sua inscrição...'):
+                    payload = {
+                        'name': st.session_state.name, 'cpf': st.session_state.cpf,
+                        'course': selected_course, 'choice': selected_choice,
+                        'turma': turma, 'semester': semester, 'nota_predita': entry_info.get('NOTA_PREDITA', 'N/A'),
+                    }
+                    # Um segundo clique (ou outra aba) com os mesmos dados reaproveita o envio pendente ou concluído
+                    key = submission_key(st.session_state.cpf, selected_course, turma, semester)
+                    try:
+                        response = submission_guard.submit(
+                            key, payload, partial(send_enrollment, payload, key, partial(show_queue_position, queue_notice))
+                        )
+                        response.raise_for_status()
+                        for state_key in list(st.session_state.keys()):
+                            del st.session_state[state_key]
+                        # A confirmação é mostrada no próximo run, sem segurar a thread do script
+                        st.session_state.enrollment_finished = True
+                        st.rerun(scope='app')
+                    except requests.exceptions.HTTPError as e:
+                        detail = e.response.json().get('detail', 'Ocorreu um erro.')
+                        st.error(f'Erro ao finalizar: {detail}')
+                    except (AdmissionRejected, CircuitOpen) as e:
+                        st.warning(str(e))
+                    except requests.exceptions.RequestException as e:
+                        st.error(f'Erro de conexão: {e}')
+                    finally:
+                        queue_notice.empty()
+
+
 # --- EXECUÇÃO PRINCIPAL ---
 
-load_css()
+metrics.start_exporter()
+static_assets.load_css('css/enrollment.css')
 
 # Adiciona a logo ao topo da página principal
-logo_base64 = load_image_as_base64('logo.png')
-if logo_base64:
-    st.markdown(
-        f'<div class="logo-container"><img src="data:image/png;base64,{logo_base64}" class="logo-img"></div>',
-        unsafe_allow_html=True,
-    )
+static_assets.show_logo()
 
 # Inicialização do estado da sessão
 st.session_state.setdefault('is_verified', False)
@@ -133,119 +297,15 @@ st.session_state.setdefault('semestre', [])
 
 # Centraliza o conteúdo do formulário na tela
 _, main_col, _ = st.columns([1, 1.5, 1])
-with main_col:
+with main_col, metrics.timer('script_run', page='inscricao'):
+    if st.session_state.pop('enrollment_finished', False):
+        st.success('Inscrição finalizada com sucesso!')
+        st.balloons()
+
     # --- ETAPA 1: VERIFICAÇÃO DE DADOS ---
     if not st.session_state.is_verified:
-        st.title('Sistema de Inscrição')
-
-        with st.form(key='form_verification'):
-            st.header('Passo 1: Verificação de Dados')
-            name = st.text_input('Nome Completo', placeholder='Digite seu nome completo')
-            cpf = st.text_input('CPF', placeholder='Exemplo: 111.111.111-11')
-            submit_button = st.form_submit_button(label='Verificar',width='stretch')
-
-        if submit_button:
-            if not name or not cpf:
-                st.error('Por favor, preencha o nome e o CPF.')
-            else:
-                cleaned_name = remover_numeros_e_acentos_unidecode(name)
-                with st.spinner('Verificando seus dados...'):
-                    try:
-                        response = requests.get(
-                            f'{API_BASE_URL}/enrollment/verify-cpf-by-name',
-                            params={'name': cleaned_name, 'cpf': cpf},
-                        )
-                        response.raise_for_status()
-                        st.session_state.is_verified = True
-                        st.session_state.name = cleaned_name
-                        st.session_state.cpf = cpf
-                        st.success('Dados verificados! Você pode prosseguir.')
-                        time.sleep(1)
-                        st.rerun()
-                    except requests.exceptions.HTTPError as e:
-                        msg = e.response.json()
-                        st.error(f'Erro na verificação: {msg}')
-                    except requests.exceptions.RequestException as e:
-                        st.error(f'Erro ao conectar com a API: {e}')
+        display_verification_step()
 
     # --- ETAPA 2: INSCRIÇÃO ---
-    if st.session_state.is_verified:
-        st.title('Finalize sua Inscrição')
-
-        if not st.session_state.courses:
-            with st.spinner('Buscando cursos...'):
-                try:
-                    response = requests.get(
-                        f'{API_BASE_URL}/enrollment/courses',
-                        params={'name': st.session_state.name, 'cpf': st.session_state.cpf},
-                    )
-                    response.raise_for_status()
-                    st.session_state.courses = response.json().get('courses', [])
-                except requests.exceptions.RequestException:
-                    st.error('Erro ao buscar cursos.')
-
-        if not st.session_state.courses:
-            st.warning('Nenhum curso disponível para você no momento.')
-            st.stop()
-
-        with st.form(key='form_enrollment'):
-            st.header('Passo 2: Seleção de Curso')
-            st.info(f'Bem-vindo(a), {st.session_state.name}!')
-
-            selected_course = st.selectbox('Selecione seu curso', st.session_state.courses)
-
-            # Lógica para buscar informações do curso e turmas
-            if selected_course:
-                session_key = f'entry_info_{selected_course}'
-                if session_key not in st.session_state:
-                    try:
-                        entry_info_resp = requests.get(
-                            f'{API_BASE_URL}/enrollment/entry-info',
-                            params={'name': st.session_state.name, 'cpf': st.session_state.cpf, 'course': selected_course},
-                        )
-                        entry_info_resp.raise_for_status()
-                        st.session_state[session_key] = entry_info_resp.json()
-
-                        if not st.session_state.turmas:
-                            turmas_resp = requests.get(f'{API_BASE_URL}/turma/active')
-                            turmas_resp.raise_for_status()
-                            data = turmas_resp.json()
-                            st.session_state.turmas = data.get('turmas', [])
-                            st.session_state.semestre = [data.get('active_semester', 'N/A')]
-                    except requests.exceptions.RequestException as e:
-                        st.error(f'Erro ao buscar informações: {e}')
-
-                entry_info = st.session_state.get(session_key)
-                if entry_info:
-                    st.write(f"Sua Nota Predita: **{entry_info.get('NOTA_PREDITA', 'N/A')}**")
-                    selected_choice = st.selectbox('Escolha uma opção', entry_info.get('OPCOES', []))
-
-            turma = st.selectbox('Turma', [t['name'] for t in st.session_state.get('turmas', [])])
-            semester = st.selectbox('Semestre', st.session_state.get('semestre', []), disabled=True)
-
-            submit_enrollment = st.form_submit_button('Finalizar Inscrição', width='stretch')
-
-            if submit_enrollment:
-                if not all([turma, semester, selected_choice]):
-                    st.error('Por favor, selecione todas as opções.')
-                else:
-                    with st.spinner('Finalizando sua inscrição...'):
-                        payload = {
-                            'name': st.session_state.name, 'cpf': st.session_state.cpf,
-                            'course': selected_course, 'choice': selected_choice,
-                            'turma': turma, 'semester': semester, 'nota_predita': entry_info.get('NOTA_PREDITA', 'N/A'),
-                        }
-                        try:
-                            response = requests.post(f'{API_BASE_URL}/enrollment/', json=payload)
-                            response.raise_for_status()
-                            st.success('Inscrição finalizada com sucesso!')
-                            st.balloons()
-                            for key in list(st.session_state.keys()):
-                                del st.session_state[key]
-                            time.sleep(2)
-                            st.rerun()
-                        except requests.exceptions.HTTPError as e:
-                            detail = e.response.json().get('detail', 'Ocorreu um erro.')
-                            st.error(f'Erro ao finalizar: {detail}')
-                        except requests.exceptions.RequestException as e:
-                            st.error(f'Erro de conexão: {e}')
\ No newline at end of file
+    else:
+        display_enrollment_step()
@@ -1,13 +1,41 @@
-import base64
+import time
 from datetime import datetime
+from functools import partial
+from math import ceil
 from os import getenv
-from pathlib import Path
 
 import pandas as pd
 import requests
 import streamlit as st
 from dotenv import load_dotenv
-from io import BytesIO
+from utils import (
+    admission,
+    analytics,
+    api_client,
+    cache_backend,
+    circuit_breaker,
+    concurrency,
+    dataset,
+    export,
+    http_cache,
+    metrics,
+    query_cache,
+    static_assets,
+)
+from utils.auth_session import AdminSession, AuthenticationFailed, SessionExpired
+from utils.export_jobs import export_jobs
+from utils.idempotency import submission_guard
+from utils.navigation import lazy_tabs, timed_fragment
+from utils.pagination import PagedQuery
+from utils.query_cache import (
+    config_loader,
+    enrollment_cache,
+    normalize_params,
+    semesters_loader,
+    turmas_loader,
+    users_loader,
+)
+from utils.shared_cache import public_cache
 
 # --- CONFIGURAÇÃO INICIAL DA PÁGINA ---
 st.set_page_config(page_title='Admin | DLPL', page_icon='🔑', layout='wide', initial_sidebar_state="expanded")
@@ -16,151 +44,128 @@ st.set_page_config(page_title='Admin | DLPL', page_icon='🔑', layout='wide', i
 load_dotenv()
 API_BASE_URL = getenv('API_URL', 'http://localhost:3001')
 
+USER_UPDATE_ENDPOINTS = {'is_active': '/users/update-active', 'admin': '/users/update-admin'}
+USERS_BULK_ENDPOINT = '/users/bulk-update'
+# Filtros da aba de inscrições, preservados ao trocar de seção
+ENROLLMENT_FILTER_KEYS = (
+    'enrollment_nome', 'enrollment_semestre', 'enrollment_turma', 'enrollment_escolha',
+    'enrollment_mode', 'enrollment_sort_by', 'enrollment_page_size', 'enrollment_auto_sync',
+    'enrollment_export_format',
+)
+ANALYTICS_FILTER_KEYS = ('analytics_semestre', 'analytics_auto_sync')
+# Intervalo da atualização automática do modo local (segundos)
+ENROLLMENT_SYNC_INTERVAL = float(getenv('ENROLLMENT_SYNC_INTERVAL', '30'))
+# Intervalo de atualização do progresso de uma exportação (segundos)
+EXPORT_POLL_INTERVAL = float(getenv('EXPORT_POLL_INTERVAL', '1'))
+# Respostas da API que indicam cursor de sincronização recusado
+SYNC_CURSOR_REJECTED = {400, 404, 405, 409, 410, 422}
+# Modos de consulta da aba de inscrições: rótulo -> modo
+ENROLLMENT_MODES = {
+    'Paginação no servidor': 'paged',
+    'Consulta completa no servidor': 'full',
+    'Filtro local (memória)': 'local',
+}
 
-# --- FUNÇÕES HELPER ---
-def load_image_as_base64(image_path):
-    """Carrega uma imagem local e a converte para base64 para embutir no app."""
-    try:
-        with Path(image_path).open('rb') as f:
-            return base64.b64encode(f.read()).decode()
-    except FileNotFoundError:
-        return None
-
-
-def load_css():
-    """
-    Carrega e injeta um CSS customizado que se adapta automaticamente
-    aos temas claro e escuro do Streamlit.
-    """
-    st.markdown(
-        """
-    <style>
-        /* Remove a barra superior do Streamlit */
-        header {visibility: hidden;}
-
-        /* --- TIPOGRAFIA --- */
-        h1, h2, h3 { color: var(--text-color); }
-        h1 { font-weight: 600; padding-bottom: 1rem; }
-        h2 { font-weight: 600; }
-        h3 { font-weight: 500; opacity: 0.8; padding-bottom: 1rem; }
-
-        /* --- ABAS (TABS) --- */
-        div[data-baseweb="tab-list"] {
-            gap: 12px;
-            border-bottom: 1px solid var(--border-color, rgba(128,128,128,0.2));
-        }
-        button[data-baseweb="tab"] {
-            background-color: transparent; border-bottom: 2px solid transparent !important;
-            font-weight: 500; color: var(--text-color); opacity: 0.7;
-            transition: all 0.2s;
-        }
-        button[data-baseweb="tab"]:hover {
-            background-color: var(--secondary-background-color); opacity: 1;
-        }
-        button[data-baseweb="tab"][aria-selected="true"] {
-            color: #4A7729; /* Verde DLPL (cor da marca) */
-            border-bottom: 2px solid #4A7729 !important; opacity: 1;
-        }
 
-        /* --- "CARDS" / CONTAINERS --- */
-        div[data-testid="stExpander"], div[data-testid="stForm"] {
-            background-color: var(--secondary-background-color);
-            border: 1px solid var(--border-color, rgba(128,128,128,0.2));
-            border-radius: 18px;
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.04);
-            overflow: hidden; margin-bottom: 1.5rem;
-        }
-        div[data-testid="stExpander"] > details { padding: 1rem 1.25rem; }
-        div[data-testid="stExpander"] > details > summary { font-weight: 600; color: var(--text-color); }
-        div[data-testid="stForm"] > form { padding: 1.5rem 2rem; }
-
-        /* --- WIDGETS (BOTÕES, INPUTS) --- */
-        .stButton > button {
-            border: none; border-radius: 12px; padding: 12px 24px;
-            font-weight: 600; font-size: 15px; color: white;
-            background-color: #4A7729; /* Verde do logo DLPL */
-            transition: all 0.2s ease-in-out;
-        }
-        .stButton > button:hover {
-            background-color: #3b6021; transform: translateY(-2px);
-        }
-        .stButton > button:focus {
-            outline: none !important;
-            box-shadow: 0 0 0 3px rgba(74, 119, 41, 0.4);
-        }
-
-        /* Botão secundário/perigoso (Delete) */
-        .stButton > button[kind="primary"] { background-color: #d93f3f; }
-        .stButton > button[kind="primary"]:hover { background-color: #b32b2b; }
-
-        /* Inputs de texto e Selectbox */
-        .stTextInput input, .stSelectbox div[data-baseweb="select"] > div {
-            border-radius: 12px !important;
-            border: 1px solid var(--border-color, rgba(128,128,128,0.2)) !important;
-            background-color: var(--background-color) !important; font-size: 16px !important;
-        }
-        .stTextInput input:focus, .stSelectbox > div > div:focus-within {
-            border: 2px solid #4A7729 !important;
-            box-shadow: 0 0 0 3px rgba(74, 119, 41, 0.4) !important;
-        }
-
-        /* --- LOGO --- */
-        .logo-container {
-            display: flex; justify-content: center;
-            margin: 1rem 0 2rem 0;
-        }
-        .logo-img {
-            max-width: 150px; height: 150px;
-            filter: none !important; /* Impede que o tema escuro inverta as cores da logo */
-        }
-    </style>
-    """,
-        unsafe_allow_html=True,
-    )
+# --- FUNÇÕES HELPER ---
+def admin_session():
+    """Sessão autenticada do administrador atual (`AdminSession`), ou `None` antes do login."""
+    return st.session_state.get('admin_session')
 
 
 def api_request(method, endpoint, params=None, json=None, data=None):
     """Função centralizada para fazer requisições autenticadas à API."""
-    if (
-        'access_token' not in st.session_state
-        or not st.session_state.access_token
-    ):
+    session = admin_session()
+    if session is None:
         return None
     try:
-        headers = {'Authorization': f'Bearer {st.session_state.access_token}'}
-        cookies = st.session_state.auth_cookies
-        response = requests.request(
-            method,
-            f'{API_BASE_URL}{endpoint}',
-            headers=headers,
-            cookies=cookies,
-            params=params,
-            json=json,
-            data=data,
-        )
+        response = session.request(method, endpoint, params=params, json=json, data=data)
         response.raise_for_status()
+        if method.upper() != 'GET':
+            query_cache.notify_write(endpoint, session.username)
         return response.json() if response.text else {}
     except requests.exceptions.HTTPError as e:
-        error = e.response.json()
-        st.error(f'Erro na API ({e.response.status_code}): {error}')
+        st.error(describe_api_error(e))
+        return None
+    except SessionExpired as e:
+        st.error(str(e))
+        return None
+    except circuit_breaker.CircuitOpen as e:
+        st.warning(str(e))
         return None
     except requests.exceptions.RequestException as e:
         st.error(f'Erro de conexão: {e}')
         return None
 
 
-@st.cache_data(ttl=600)
+def get_enrollments(params):
+    """Busca as inscrições filtradas, reaproveitando o cache de consultas."""
+    session = admin_session()
+    if session is None:
+        return None
+    fetch = partial(api_request, 'GET', '/enrollment/', params=params)
+    return enrollment_cache.get_or_fetch(session.username, params, fetch)
+
+
+def session_json(session, endpoint, params=None, reauthenticate=True, rejected=()):
+    """
+    GET autenticado em `endpoint` pela sessão, retornando o JSON da resposta
+    (ou `None` se o status estiver em `rejected`). Não usa o Streamlit: é a
+    busca das funções que rodam nos pools de threads (prefetch de páginas,
+    sincronização, exportações e atualização dos caches).
+    """
+    response = session.get(endpoint, params=params, reauthenticate=reauthenticate)
+    if response.status_code in rejected:
+        return None
+    response.raise_for_status()
+    return response.json() if response.text else {}
+
+
+def fetch_enrollment_page(session, params, sort_by, offset, limit, cursor):
+    """Busca uma página de inscrições; também roda em segundo plano, no prefetch da próxima página."""
+    page_params = {**params, 'offset': offset, 'limit': limit, 'sort_by': sort_by, 'cursor': cursor}
+    fetch = partial(session_json, session, '/enrollment/', page_params)
+    return enrollment_cache.get_or_fetch(session.username, page_params, fetch)
+
+
+def load_cached(loader, key, endpoint, params=None):
+    """
+    Consulta `endpoint` pelo cache com tags `loader`. A atualização antecipada
+    após uma escrita roda sem o administrador na página, então não refaz o login.
+    """
+    session = admin_session()
+    if session is None:
+        return None
+    fetch = partial(api_request, 'GET', endpoint, params=params)
+    refresh = partial(session_json, endpoint=endpoint, params=params, reauthenticate=False)
+    return loader.get_or_fetch(key, fetch, refresh=refresh, session=session)
+
+
 def get_semesters():
-    data = api_request('GET', '/turma/semesters')
+    data = load_cached(semesters_loader, 'all', '/turma/semesters')
     return data.get('semesters', []) if data else []
 
 
-@st.cache_data(ttl=600)
 def get_all_turmas():
-    data = api_request('GET', '/turma/', params={'is_active': None})
+    data = load_cached(turmas_loader, 'all', '/turma/', params={'is_active': None})
     return data.get('turmas', []) if data else []
 
 
+def get_config():
+    return load_cached(config_loader, 'current', '/config/')
+
+
+def get_users():
+    data = load_cached(users_loader, 'all', '/users/', params={'is_active': None})
+    return data.get('users', []) if data else None
+
+
+def build_dataframe(rows, view):
+    """Monta o DataFrame de uma listagem, registrando o tempo de construção em `metrics`."""
+    with metrics.timer('dataframe_build', view=view):
+        return pd.DataFrame(rows)
+
+
 def display_login_form():
     """Mostra o formulário de login centralizado."""
     _, main_col, _ = st.columns([1, 1.5, 1])
@@ -176,40 +181,31 @@ def display_login_form():
             )
             if st.form_submit_button('Entrar', width='stretch'):
                 try:
-                    session = requests.Session()
-                    response = session.post(
-                        f'{API_BASE_URL}/users/login',
-                        data={'name': username, 'password': password},
-                    )
-                    response.raise_for_status()
-                    access_token = response.json().get('token')
-                    cookies = session.cookies.get_dict()
-                    if access_token and 'session-token' in cookies:
-                        st.session_state.access_token = access_token
-                        st.session_state.auth_cookies = cookies
-                        st.rerun()
-                    else:
-                        st.error('Credenciais inválidas.')
+                    st.session_state.admin_session = AdminSession.open(API_BASE_URL, username, password)
+                    st.rerun()
+                except AuthenticationFailed:
+                    st.error('Credenciais inválidas.')
                 except requests.exceptions.HTTPError:
                     st.error('Erro no login. Verifique suas credenciais.')
                 except requests.exceptions.RequestException as e:
                     st.error(f'Erro de conexão com a API: {e}')
 
 
+@timed_fragment('admin:inscricoes')
 def display_enrollment_manager():
     st.subheader('Filtrar Inscrições')
     col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
     with col1:
-        nome_aluno = st.text_input('Filtrar por nome do aluno')
+        nome_aluno = st.text_input('Filtrar por nome do aluno', key='enrollment_nome')
     with col2:
         semestres_disponiveis = ['Todos'] + get_semesters()
-        semestre = st.selectbox('Filtrar por semestre', semestres_disponiveis)
+        semestre = st.selectbox('Filtrar por semestre', semestres_disponiveis, key='enrollment_semestre')
     with col3:
         turmas_disponiveis = ['Todas'] + [t['name'] for t in get_all_turmas()]
-        turma = st.selectbox('Filtrar por turma', turmas_disponiveis)
+        turma = st.selectbox('Filtrar por turma', turmas_disponiveis, key='enrollment_turma')
     with col4:
         escolhas_disponiveis = ['Todos', 'Cursar disciplina', 'Dispensa de disciplina']
-        escolha = st.selectbox('Filtrar por escolha', escolhas_disponiveis)
+        escolha = st.selectbox('Filtrar por escolha', escolhas_disponiveis, key='enrollment_escolha')
 
     params = {
         'query_nome': nome_aluno if nome_aluno else None,
@@ -217,30 +213,419 @@ def display_enrollment_manager():
         'query_turma': turma if turma != 'Todas' else None,
         'query_escolha': escolha if escolha != 'Todos' else None,
     }
-    data = api_request('GET', '/enrollment/', params=params)
-    if data:
-        df_inscricoes = pd.DataFrame(data.get('data', []))
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            df_inscricoes.to_excel(writer, index=False, sheet_name='enrollments')
-
-            for column in df_inscricoes:
-                column_width = max(df_inscricoes[column].astype(str).map(len).max(), len(column))
-                col_idx = df_inscricoes.columns.get_loc(column)
-                writer.sheets['enrollments'].set_column(col_idx, col_idx, column_width)
-
-        st.download_button(
-            label='Download dos Dados em Excel',
-            data=buffer.getvalue(),
-            file_name=f'inscricoes_{nome_aluno or ""}_{semestre or ""}.xlsx',
-            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    mode = st.radio('Modo de consulta', list(ENROLLMENT_MODES), horizontal=True, key='enrollment_mode')
+    if ENROLLMENT_MODES[mode] == 'paged':
+        display_enrollment_pages(params, nome_aluno, semestre)
+    elif ENROLLMENT_MODES[mode] == 'local':
+        display_enrollment_local(params, nome_aluno, semestre)
+    else:
+        data = get_enrollments(params)
+        if data:
+            df_inscricoes = build_dataframe(data.get('data', []), 'inscricoes')
+            display_enrollment_table(df_inscricoes, params, nome_aluno, semestre)
+
+    stats = enrollment_cache.stats()
+    st.caption(
+        f"Cache de consultas: {stats['hits']} acertos, {stats['misses']} falhas "
+        f"({stats['size']} consultas em cache)"
+    )
+
+
+def fetch_enrollment_changes(session, scope, cursor):
+    """
+    Busca as inscrições alteradas desde `cursor`. Retorna `None` se o backend
+    recusar o cursor (expirado, inválido ou não suportado), para o chamador
+    recarregar tudo.
+    """
+    params = {'query_semestre': scope, 'updated_since': cursor}
+    return session_json(session, '/enrollment/', params, rejected=SYNC_CURSOR_REJECTED)
+
+
+def sync_enrollments(enrollments, scope):
+    try:
+        return enrollments.sync(
+            partial(fetch_enrollment_changes, admin_session(), scope),
+            partial(api_request, 'GET', '/enrollment/', params={'query_semestre': scope}),
+        )
+    except requests.exceptions.RequestException as e:
+        st.error(f'Erro ao sincronizar: {e}')
+        return None
+
+
+def display_enrollment_local(params, nome_aluno, semestre):
+    """
+    Carrega uma vez as inscrições do semestre em um DataFrame compacto e aplica
+    os filtros localmente, sem nova consulta à API a cada mudança de filtro.
+    Atualizações buscam só as inscrições alteradas desde a última sincronização.
+    """
+    scope = params['query_semestre']
+    fetch = partial(api_request, 'GET', '/enrollment/', params={'query_semestre': scope})
+    try:
+        enrollments = dataset.load_enrollments(scope, admin_session().username, enrollment_cache.generation, fetch)
+    except dataset.DatasetUnavailable:
+        return
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        auto_sync = st.toggle(
+            f'Atualizar automaticamente (a cada {ENROLLMENT_SYNC_INTERVAL:.0f}s)', key='enrollment_auto_sync'
+        )
+    with col2:
+        if st.button('🔄 Sincronizar', width='stretch'):
+            sync_enrollments(enrollments, scope)
+
+    if auto_sync:
+        display_enrollment_snapshot_live(enrollments, scope, params, nome_aluno, semestre)
+    else:
+        display_enrollment_snapshot(enrollments, params, nome_aluno, semestre)
+
+
+@st.fragment(run_every=ENROLLMENT_SYNC_INTERVAL)
+def display_enrollment_snapshot_live(enrollments, scope, params, nome_aluno, semestre):
+    # O conjunto é compartilhado pelas sessões do administrador: sincroniza só se nenhuma o fez há pouco
+    if time.time() - enrollments.synced_at >= 0.9 * ENROLLMENT_SYNC_INTERVAL:
+        sync_enrollments(enrollments, scope)
+    display_enrollment_snapshot(enrollments, params, nome_aluno, semestre)
+
+
+def display_enrollment_snapshot(enrollments, params, nome_aluno, semestre):
+    df_inscricoes, seconds = enrollments.filter(
+        nome=params['query_nome'],
+        semestre=params['query_semestre'],
+        turma=params['query_turma'],
+        escolha=params['query_escolha'],
+    )
+    saved = 1 - enrollments.memory_bytes / enrollments.object_bytes if enrollments.object_bytes else 0
+    last_sync = enrollments.last_sync
+    sync_detail = (
+        f"{last_sync['changed']} alteradas, {last_sync['deleted']} removidas"
+        if last_sync['mode'] == 'delta'
+        else 'carga completa'
+    )
+    st.caption(
+        f'{len(df_inscricoes)} de {len(enrollments.df)} inscrições · filtro local em {1000 * seconds:.1f} ms · '
+        f'memória {enrollments.memory_bytes / 1024:,.0f} KB '
+        f'(tipos padrão: {enrollments.object_bytes / 1024:,.0f} KB, {saved:.0%} menor) · '
+        f'sincronizado às {datetime.fromtimestamp(enrollments.synced_at):%H:%M:%S} ({sync_detail})'
+    )
+    display_enrollment_table(df_inscricoes, params, nome_aluno, semestre)
+
+
+def display_enrollment_table(df_inscricoes, params, nome_aluno, semestre):
+    display_enrollment_export(params, nome_aluno, semestre, df_inscricoes)
+    st.dataframe(df_inscricoes, width='stretch', hide_index=True)
+
+
+def fetch_enrollments_frame(session, params):
+    """Busca a lista completa filtrada para uma exportação, no pool de exportação."""
+    fetch = partial(session_json, session, '/enrollment/', params)
+    data = enrollment_cache.get_or_fetch(session.username, params, fetch)
+    return build_dataframe(data.get('data', []), 'inscricoes_exportacao')
+
+
+def display_enrollment_export(params, nome_aluno, semestre, df_inscricoes=None):
+    """
+    Gera o arquivo de exportação em segundo plano, com progresso e cancelamento,
+    sem travar a sessão. No modo paginado (sem `df_inscricoes`), a lista
+    completa filtrada é buscada pela própria tarefa.
+    """
+    filters = normalize_params(params)
+    col1, col2 = st.columns([3, 1], vertical_alignment='bottom')
+    with col1:
+        format_key = st.selectbox(
+            'Formato da exportação',
+            list(export.FORMATS),
+            format_func=lambda key: export.FORMATS[key].label,
+            key='enrollment_export_format',
         )
+    with col2:
+        requested = st.button('📦 Gerar arquivo', width='stretch')
+
+    prepared = st.session_state.get('enrollment_export')
+    if prepared and (
+        prepared['filters'] != filters
+        or prepared['format'] != format_key
+        or (df_inscricoes is not None and prepared['version'] != export.data_version(df_inscricoes))
+    ):
+        prepared = st.session_state.enrollment_export = None
+
+    if requested:
+        if df_inscricoes is not None:
+            version = export.data_version(df_inscricoes)
+            load = df_inscricoes.copy
+        else:
+            # Sem os dados em mãos, a tarefa busca a lista e usa o hash dela como versão
+            version = None
+            load = partial(fetch_enrollments_frame, admin_session(), params)
+        job = export_jobs.submit(format_key, filters, load, admin_session().username, version=version)
+        prepared = st.session_state.enrollment_export = {
+            'filters': filters, 'format': format_key, 'version': version, 'job': job.id,
+        }
+
+    job = export_jobs.get(prepared['job']) if prepared else None
+    if job is None:
+        return
+    if not job.finished:
+        display_export_progress(job.id)
+    elif job.state == 'done':
+        display_export_download(job, nome_aluno, semestre)
+    elif job.state == 'failed':
+        st.error(f'Falha ao gerar o arquivo: {job.error}')
+    else:
+        st.info('Exportação cancelada.')
+
+
+@st.fragment(run_every=EXPORT_POLL_INTERVAL)
+def display_export_progress(job_id):
+    """Acompanha a tarefa sem reexecutar a página; ao terminar, a página é redesenhada com o download."""
+    job = export_jobs.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.progress(job.progress, text=job.describe())
+    with col2:
+        st.button('✖ Cancelar', on_click=job.cancel, width='stretch', key=f'cancel_export_{job_id}')
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def export_bytes(job_id, _path):
+    """Conteúdo do arquivo de uma tarefa, lido do disco uma única vez e não a cada interação."""
+    return _path.read_bytes()
+
+
+def display_export_download(job, nome_aluno, semestre):
+    export_format = export.FORMATS[job.format]
+    try:
+        data = export_bytes(job.id, job.path)
+    except OSError:
+        # O arquivo saiu do armazenamento temporário; um novo pedido o gera de novo
+        st.session_state.enrollment_export = None
+        st.warning('O arquivo expirou. Gere-o novamente.')
+        return
+    seconds = (job.finished_at or job.created_at) - job.created_at
+    st.download_button(
+        label=f'Download ({export_format.label}, {job.size / 1024:,.0f} KB)',
+        data=data,
+        file_name=f'inscricoes_{nome_aluno or ""}_{semestre or ""}.{export_format.extension}',
+        mime=export_format.mime,
+    )
+    st.caption('Arquivo reaproveitado de uma exportação anterior.' if job.reused else f'Gerado em {seconds:.1f}s.')
+
 
+def change_enrollment_page(delta):
+    st.session_state.enrollment_page_number += delta
 
-        st.dataframe(df_inscricoes, width='stretch', hide_index=True)
 
+def display_enrollment_pages(params, nome_aluno, semestre):
+    """Mostra as inscrições página a página, buscando só a página visível na API."""
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_by = st.selectbox('Ordenar por', ['nome', 'semestre', 'turma', 'escolha'], key='enrollment_sort_by')
+    with col2:
+        page_size = st.selectbox('Linhas por página', [50, 100, 250, 500], key='enrollment_page_size')
+    with col3:
+        refresh = st.button('🔄 Atualizar', width='stretch')
+
+    pager = st.session_state.get('enrollment_pager')
+    if pager is None or pager.page_size != page_size:
+        pager = st.session_state.enrollment_pager = PagedQuery(page_size=page_size)
+    if refresh:
+        pager.clear()
+        enrollment_cache.invalidate()
+        st.session_state.enrollment_export = None
+
+    # Volta para a primeira página sempre que um filtro ou a ordenação mudam;
+    # a geração do cache descarta páginas buscadas antes de uma escrita
+    query = (enrollment_cache.generation, normalize_params(params), sort_by)
+    if st.session_state.get('enrollment_query') != query:
+        st.session_state.enrollment_query = query
+        st.session_state.enrollment_page_number = 0
+    number = st.session_state.enrollment_page_number
+
+    fetch = partial(fetch_enrollment_page, admin_session(), params, sort_by)
+    try:
+        page = pager.get_page(fetch, query, number)
+    except requests.exceptions.RequestException as e:
+        st.error(describe_api_error(e))
+        return
+
+    df_pagina = build_dataframe(page.rows, 'inscricoes_pagina')
+    if not page.paged:
+        # O backend não suporta paginação: a resposta já é a lista completa
+        display_enrollment_table(df_pagina, params, nome_aluno, semestre)
+        return
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button('← Anterior', disabled=number == 0, on_click=change_enrollment_page, args=(-1,), width='stretch')
+    with col2:
+        total_pages = ceil(page.total / page_size) if page.total else None
+        st.caption(f'Página {number + 1}' + (f' de {total_pages} ({page.total} inscrições)' if total_pages else ''))
+    with col3:
+        st.button('Próxima →', disabled=not page.has_next, on_click=change_enrollment_page, args=(1,), width='stretch')
+
+    display_enrollment_export(params, nome_aluno, semestre)
+    st.dataframe(df_pagina, width='stretch', hide_index=True)
 
 
+def load_analytics(scope, sync_after=None):
+    """
+    Contagens por turma, escolha e faixa de nota do semestre `scope` (ou de
+    todos, com `None`). Usa o endpoint de agregados do backend quando ele
+    existe, com a resposta no cache de consultas (descartada a cada escrita);
+    senão, calcula as contagens no servidor do Streamlit a partir do conjunto
+    de inscrições do modo local, atualizadas só com as linhas alteradas em cada
+    sincronização. Com `sync_after`, atualiza os dados se a última busca tem
+    pelo menos essa idade (segundos). Retorna (contagens, descrição da origem)
+    ou (None, None) se a API falhou.
+    """
+    session = admin_session()
+    params = {'endpoint': analytics.ANALYTICS_ENDPOINT, 'query_semestre': scope}
+    if sync_after is not None:
+        enrollment_cache.discard(session.username, params)
+    try:
+        fetch = partial(analytics.fetch_server_aggregates, session, scope)
+        data = enrollment_cache.get_or_fetch(session.username, params, fetch)
+    except requests.exceptions.RequestException as e:
+        st.warning(f'Agregados do servidor indisponíveis ({e}); calculando a partir das inscrições.')
+        data = None
+    if data is not None:
+        return analytics.cube_from_groups(data.get('groups', [])), 'agregados calculados pelo servidor'
+
+    fetch = partial(api_request, 'GET', '/enrollment/', params={'query_semestre': scope})
+    try:
+        enrollments = dataset.load_enrollments(scope, session.username, enrollment_cache.generation, fetch)
+    except dataset.DatasetUnavailable:
+        return None, None
+    if sync_after is not None and time.time() - enrollments.synced_at >= sync_after:
+        sync_enrollments(enrollments, scope)
+    aggregates = analytics.dataset_aggregates(enrollments)
+    cube = aggregates.update(enrollments)
+    update = aggregates.last_update
+    mode = 'contagem completa' if update['mode'] == 'full' else f"{update['rows']} linhas alteradas"
+    source = (
+        f'calculado de {len(enrollments.df)} inscrições ({mode}, {1000 * update["seconds"]:.1f} ms) · '
+        f'sincronizado às {datetime.fromtimestamp(enrollments.synced_at):%H:%M:%S}'
+    )
+    return cube, source
+
+
+@timed_fragment('admin:analises')
+def display_analytics_manager():
+    st.subheader('Análise das Inscrições')
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        semestre = st.selectbox('Semestre', ['Todos'] + get_semesters(), key='analytics_semestre')
+    with col2:
+        auto_sync = st.toggle(
+            f'Atualizar automaticamente (a cada {ENROLLMENT_SYNC_INTERVAL:.0f}s)', key='analytics_auto_sync'
+        )
+    with col3:
+        refresh = st.button('🔄 Atualizar', key='analytics_refresh', width='stretch')
+
+    scope = semestre if semestre != 'Todos' else None
+    if auto_sync:
+        display_analytics_live(scope)
+    else:
+        display_analytics(scope, sync_after=0 if refresh else None)
+
+
+@st.fragment(run_every=ENROLLMENT_SYNC_INTERVAL)
+def display_analytics_live(scope):
+    display_analytics(scope, sync_after=0.9 * ENROLLMENT_SYNC_INTERVAL)
+
+
+def display_analytics(scope, sync_after=None):
+    """Mostra os totais e os gráficos; o navegador recebe só as contagens, não as inscrições."""
+    cube, source = load_analytics(scope, sync_after)
+    if cube is None:
+        return
+    if not len(cube):
+        st.info('Nenhuma inscrição encontrada para o semestre selecionado.')
+        return
+
+    by_choice = analytics.breakdown(cube, 'escolha').set_index('escolha')['total']
+    columns = st.columns(4)
+    columns[0].metric('Inscrições', f'{int(cube.sum()):,}'.replace(',', '.'))
+    columns[1].metric('Cursar disciplina', f"{int(by_choice.get('Cursar disciplina', 0)):,}".replace(',', '.'))
+    columns[2].metric('Dispensa de disciplina', f"{int(by_choice.get('Dispensa de disciplina', 0)):,}".replace(',', '.'))
+    columns[3].metric('Turmas', cube.index.get_level_values('turma').nunique())
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        st.markdown('**Inscrições por turma**')
+        st.altair_chart(analytics.turma_chart(cube), use_container_width=True)
+    with col2:
+        st.markdown('**Escolha**')
+        st.altair_chart(analytics.choice_chart(cube), use_container_width=True)
+    st.markdown('**Nota predita**')
+    st.altair_chart(analytics.grade_band_chart(cube), use_container_width=True)
+
+    with st.expander('Tabela por turma e escolha'):
+        table = analytics.crosstab(cube, 'turma', 'escolha').pivot(index='turma', columns='escolha', values='total')
+        st.dataframe(table.fillna(0).astype(int), width='stretch')
+    st.caption(f'Origem: {source}')
+
+
+def collect_user_changes(df_users, edited_rows):
+    """Reúne as edições do data_editor em um único conjunto de alterações (usuário, campo, valor)."""
+    changes = []
+    for idx, updates in edited_rows.items():
+        for field in USER_UPDATE_ENDPOINTS:
+            if field in updates:
+                changes.append(
+                    {'row': idx, 'name': df_users.iloc[idx]['name'], 'field': field, 'value': bool(updates[field])}
+                )
+    return changes
+
+
+def describe_api_error(e):
+    if isinstance(e, (SessionExpired, circuit_breaker.CircuitOpen)):
+        return str(e)
+    if isinstance(e, requests.exceptions.HTTPError):
+        try:
+            return f'Erro na API ({e.response.status_code}): {e.response.json()}'
+        except ValueError:
+            return f'Erro na API ({e.response.status_code})'
+    return f'Erro de conexão: {e}'
+
+
+def send_user_change(session, change):
+    """Envia uma alteração pela rota individual, no pool de threads."""
+    response = session.request(
+        'PUT',
+        USER_UPDATE_ENDPOINTS[change['field']],
+        data={'name': change['name'], change['field']: change['value']},
+    )
+    response.raise_for_status()
+
+
+def save_user_changes(changes):
+    """
+    Envia o conjunto de alterações em uma única requisição quando o backend oferece
+    `PUT /users/bulk-update`; senão, envia as rotas individuais em paralelo no pool
+    compartilhado. Retorna, para cada alteração, `None` ou a mensagem de erro.
+    """
+    session = admin_session()
+    bulk_url = f'{API_BASE_URL}{USERS_BULK_ENDPOINT}'
+    if api_client.endpoint_supported('PUT', bulk_url):
+        updates = {}
+        for change in changes:
+            updates.setdefault(change['name'], {'name': change['name']})[change['field']] = change['value']
+        try:
+            response = session.request('PUT', USERS_BULK_ENDPOINT, json={'updates': list(updates.values())})
+            if api_client.check_supported(response):
+                response.raise_for_status()
+                return [None] * len(changes)
+        except requests.exceptions.RequestException as e:
+            return [describe_api_error(e)] * len(changes)
+
+    results = concurrency.run_all([partial(send_user_change, session, change) for change in changes])
+    return [None if error is None else describe_api_error(error) for _, error in results]
+
+
+@timed_fragment('admin:usuarios')
 def display_user_manager():
     with st.expander('➕ Adicionar Novo Usuário'):
         with st.form('new_user_form', clear_on_submit=True):
@@ -260,55 +645,75 @@ def display_user_manager():
                         is not None
                     ):
                         st.success(f"Usuário '{new_user_name}' criado!")
+                        st.session_state.original_users_df = None
                         st.rerun()
                 else:
                     st.warning('Preencha o nome e a senha.')
 
     st.subheader('Lista de Usuários')
-    data = api_request('GET', '/users/', params={'is_active': None})
-    if data:
-        df_users = pd.DataFrame(data.get('users', []))
-        st.info('💡 Edite o status de "ativo" ou "admin" diretamente na tabela.')
-        edited_data = st.data_editor(
-            df_users,
-            width='stretch',
-            disabled=['name'],
-            key='user_editor', # A unique key for the widget
-        )
-
-        # Use Streamlit's built-in change detection
-        if st.session_state['user_editor']['edited_rows']:
-            # Get the dictionary of changes from session state
-            edited_rows = st.session_state['user_editor']['edited_rows']
-
-            for idx, updates in edited_rows.items():
-                user_name = edited_data.loc[idx, 'name']
-
-                # Check if 'is_active' was updated
-                if 'is_active' in updates:
-                    new_status = updates['is_active']
-                    api_request(
-                        'PUT',
-                        '/users/update-active',
-                        data={'name': user_name, 'is_active': bool(new_status)},
-                    )
-
-                # Check if 'admin' was updated
-                if 'admin' in updates:
-                    new_status = updates['admin']
-                    api_request(
-                        'PUT',
-                        '/users/update-admin',
-                        data={'name': user_name, 'admin': bool(new_status)},
-                    )
-
-            # Display a success message and then re-run to refresh the data
-            st.success('Alterações salvas.')
-            st.rerun()
+    refresh = st.button('🔄 Atualizar lista')
+    if refresh:
+        query_cache.invalidate_tags(('users',), source='Atualizar lista de usuários', user=admin_session().username)
+    if refresh or st.session_state.original_users_df is None:
+        users = get_users()
+        st.session_state.original_users_df = build_dataframe(users, 'usuarios') if users is not None else None
+
+    df_users = st.session_state.original_users_df
+    if df_users is not None:
+        save_results = st.session_state.pop('user_save_results', None)
+        if save_results is not None:
+            failed = save_results['Resultado'] != '✅ Salvo'
+            if failed.any():
+                st.error(f'{failed.sum()} de {len(save_results)} alterações falharam.')
+            else:
+                st.success('Alterações salvas.')
+            st.dataframe(save_results, width='stretch', hide_index=True)
+
+        st.info('💡 Edite o status de "ativo" ou "admin" diretamente na tabela e clique em salvar.')
+        editor_key = f'user_editor_{st.session_state.user_editor_version}'
+        with st.form('users_form'):
+            st.data_editor(
+                df_users,
+                width='stretch',
+                disabled=['name'],
+                key=editor_key,
+            )
+            submitted = st.form_submit_button('Salvar Alterações')
+
+        if submitted:
+            changes = collect_user_changes(df_users, st.session_state[editor_key]['edited_rows'])
+            if changes:
+                with st.spinner(f'Salvando {len(changes)} alterações...'):
+                    errors = save_user_changes(changes)
+                if any(error is None for error in errors):
+                    # As alterações saem pela sessão, fora de `api_request`
+                    query_cache.notify_write(USERS_BULK_ENDPOINT, admin_session().username)
+
+                # Aplica localmente o que foi salvo, sem buscar a lista de novo
+                df_users = df_users.copy()
+                for change, error in zip(changes, errors):
+                    if error is None:
+                        df_users.loc[df_users.index[change['row']], change['field']] = change['value']
+                st.session_state.original_users_df = df_users
+                st.session_state.user_save_results = pd.DataFrame(
+                    [
+                        {
+                            'Usuário': change['name'],
+                            'Campo': change['field'],
+                            'Novo valor': change['value'],
+                            'Resultado': '✅ Salvo' if error is None else f'❌ {error}',
+                        }
+                        for change, error in zip(changes, errors)
+                    ]
+                )
+                # Uma nova chave descarta as edições pendentes do data_editor
+                st.session_state.user_editor_version += 1
+                st.rerun()
     else:
         st.warning('Nenhum usuário encontrado.')
 
 
+@timed_fragment('admin:turmas')
 def display_class_manager():
     with st.expander('➕ Adicionar Nova Turma'):
         with st.form('new_class_form', clear_on_submit=True):
@@ -330,7 +735,6 @@ def display_class_manager():
                         st.success(
                             f"Turma '{turma_name} - {turma_semester}' criada!"
                         )
-                        st.cache_data.clear()
                         st.rerun()
 
     with st.expander('✏️ Editar ou Deletar Turma Existente'):
@@ -368,7 +772,6 @@ def display_class_manager():
                                     'new_semester': new_semester,
                                 },
                             )
-                            st.cache_data.clear()
                             st.rerun()
                     with col2:
                         if st.form_submit_button(
@@ -377,7 +780,6 @@ def display_class_manager():
                             api_request(
                                 'DELETE', '/turma/', json=selected_turma_obj
                             )
-                            st.cache_data.clear()
                             st.rerun()
 
     st.subheader('Lista de Turmas Cadastradas')
@@ -385,8 +787,9 @@ def display_class_manager():
         st.dataframe(pd.DataFrame(turmas), width='stretch')
 
 
+@timed_fragment('admin:configuracoes')
 def display_config_manager():
-    config_data = api_request('GET', '/config/')
+    config_data = get_config()
     if config_data:
         st.info(
             f"""**Configuração Atual:**
@@ -438,38 +841,141 @@ def display_config_manager():
                 st.rerun()
 
 
-# --- EXECUÇÃO PRINCIPAL ---
-load_css()
+def show_metric_table(rows, empty_message):
+    if rows:
+        st.dataframe(pd.DataFrame(rows), width='stretch', hide_index=True)
+    else:
+        st.caption(empty_message)
 
-st.session_state.setdefault('access_token', None)
-st.session_state.setdefault('auth_cookies', None)
-st.session_state.setdefault('original_users_df', None)
 
-logo_base64 = load_image_as_base64('logo.png')
-if logo_base64:
-    st.markdown(
-        f'<div class="logo-container"><img src="data:image/png;base64,{logo_base64}" class="logo-img"></div>',
-        unsafe_allow_html=True,
+@timed_fragment('admin:desempenho')
+def display_performance_manager():
+    """Latências medidas neste processo: chamadas à API, caches, páginas, fragmentos e exportações."""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption('Percentis estimados a partir dos histogramas desde o início do processo (ou da última limpeza).')
+    with col2:
+        if st.button('🧹 Zerar métricas', width='stretch'):
+            metrics.reset()
+
+    st.subheader('Chamadas à API por endpoint')
+    show_metric_table(metrics.histograms('api_request', by=('endpoint',)), 'Nenhuma chamada registrada ainda.')
+    with st.expander('Detalhe por status e cache'):
+        st.caption("`cache='miss'`: chamada feita porque a consulta não estava em cache; `none`: chamada sem cache.")
+        show_metric_table(metrics.histograms('api_request'), 'Nenhuma chamada registrada ainda.')
+
+    st.subheader('Disjuntores por endpoint')
+    st.caption(
+        'Abertos, recusam chamadas na hora (listas em cache mostram os últimos dados bons); '
+        'meio-abertos, deixam passar uma chamada de teste.'
     )
-
-if not st.session_state.access_token:
-    display_login_form()
-else:
-    st.title('Painel Administrativo')
-
-    tab1, tab2, tab3, tab4 = st.tabs(
-        [
-            '📊 Gerenciar Inscrições',
-            '👤 Gerenciar Usuários',
-            '📚 Gerenciar Turmas',
-            '⚙️ Configurações',
-        ]
+    show_metric_table(circuit_breaker.states(), 'Nenhuma chamada registrada ainda.')
+
+    st.subheader('Controle de admissão (página de inscrição)')
+    st.caption('Fila e chamadas em andamento de verificação e envio de inscrições, compartilhadas pelo processo.')
+    show_metric_table(admission.stats(), 'Nenhuma chamada admitida ainda.')
+    show_metric_table(metrics.histograms('admission_wait'), 'Nenhum aluno esperou na fila ainda.')
+    with st.expander('🔁 Envios de inscrição duplicados'):
+        st.caption(
+            '`attached`: repetição enquanto o envio estava em andamento; `replayed`: repetição respondida pelo '
+            'registro de envios concluídos; `changed`: mesma inscrição reenviada com dados diferentes.'
+        )
+        show_metric_table([submission_guard.stats()], 'Nenhum envio ainda.')
+
+    st.subheader('Caches')
+    show_metric_table(metrics.histograms('cache_lookup'), 'Nenhuma consulta aos caches ainda.')
+    with st.expander('💾 Cache HTTP em disco (revalidação com ETag/Last-Modified)'):
+        show_metric_table([http_cache.response_cache.stats()], 'Cache HTTP desativado.')
+    with st.expander('📈 Cache de dados públicos (página de inscrição)'):
+        show_metric_table(public_cache.stats(), 'Nenhuma consulta pública em cache ainda.')
+    with st.expander('🗄️ Backend de cache compartilhado entre réplicas'):
+        st.caption(
+            'Guarda as respostas públicas e as listas do painel; cada invalidação aumenta a versão do namespace, '
+            'que as outras réplicas conferem a cada '
+            f'{cache_backend.CACHE_VERSION_CHECK:g}s. `errors`: falhas do backend, tratadas como ausência no cache.'
+        )
+        show_metric_table([cache_backend.cache_store.stats()], 'Nenhum acesso ao backend ainda.')
+        show_metric_table(metrics.counters('cache_invalidation'), 'Nenhuma invalidação ainda.')
+    with st.expander('🏷️ Invalidações por tag'):
+        st.caption(
+            'Cada escrita invalida só os caches com as tags afetadas. `evicted`: entradas descartadas por escrita; '
+            '`refreshing`: consultas recarregadas em segundo plano logo após a escrita.'
+        )
+        show_metric_table(query_cache.invalidations(), 'Nenhuma escrita registrada ainda.')
+        show_metric_table(metrics.counters('cache_eviction'), 'Nenhuma entrada descartada ainda.')
+        show_metric_table(metrics.counters('cache_refresh'), 'Nenhuma atualização antecipada ainda.')
+    with st.expander('🛡️ Verificações evitadas (página de inscrição)'):
+        st.caption('Envios barrados pela validação local de nome e CPF ou respondidos pelo cache da sessão.')
+        show_metric_table(metrics.counters('verification_avoided'), 'Nenhuma verificação evitada ainda.')
+
+    st.subheader('Páginas e fragmentos')
+    show_metric_table(metrics.histograms('script_run'), 'Nenhuma execução registrada ainda.')
+    show_metric_table(metrics.timings(), 'Nenhum fragmento executado ainda.')
+
+    st.subheader('DataFrames e exportações')
+    show_metric_table(metrics.histograms('dataframe_build'), 'Nenhum DataFrame montado ainda.')
+    show_metric_table(metrics.histograms('local_filter'), 'Nenhum filtro local aplicado ainda.')
+    show_metric_table(metrics.histograms('enrollment_sync'), 'Nenhuma sincronização do modo local ainda.')
+    show_metric_table(metrics.histograms('analytics_update'), 'Nenhuma análise calculada ainda.')
+    show_metric_table(metrics.histograms('export_build'), 'Nenhuma exportação gerada ainda.')
+    with st.expander('📦 Exportações em segundo plano'):
+        show_metric_table([export_jobs.stats()], 'Nenhuma exportação ainda.')
+        show_metric_table([export_jobs.store.stats()], 'Nenhum arquivo guardado ainda.')
+        show_metric_table(metrics.counters('export_job'), 'Nenhuma exportação ainda.')
+
+    with st.expander('🔑 Sessão autenticada'):
+        st.caption('Renovações de token após um 401 e chamadas repetidas com o token novo.')
+        show_metric_table([admin_session().stats()], 'Nenhuma sessão ativa.')
+        show_metric_table(metrics.counters('admin_auth'), 'Nenhuma renovação de token ainda.')
+    with st.expander('🔌 Pool de conexões HTTP'):
+        hosts = api_client.pool_stats()['hosts']
+        show_metric_table([{'host': host, **stats} for host, stats in hosts.items()], 'Nenhuma conexão aberta ainda.')
+
+    st.download_button(
+        'Exportar métricas (formato Prometheus)',
+        data=metrics.prometheus_text(),
+        file_name='dlpl_metrics.prom',
+        mime='text/plain',
     )
-    with tab1:
-        display_enrollment_manager()
-    with tab2:
-        display_user_manager()
-    with tab3:
-        display_class_manager()
-    with tab4:
-        display_config_manager()
+    st.caption('Para coleta contínua, defina `METRICS_PORT` e aponte o Prometheus para `/metrics` nessa porta.')
+
+
+# --- EXECUÇÃO PRINCIPAL ---
+metrics.start_exporter()
+static_assets.load_css('css/admin.css')
+
+st.session_state.setdefault('admin_session', None)
+st.session_state.setdefault('original_users_df', None)
+st.session_state.setdefault('user_editor_version', 0)
+st.session_state.setdefault('enrollment_mode', 'Paginação no servidor')
+st.session_state.setdefault('enrollment_page_size', 100)
+
+static_assets.show_logo()
+
+with metrics.timer('script_run', page='admin'):
+    session = admin_session()
+    if session is None or session.expired:
+        if session is not None:
+            st.warning('Sua sessão expirou. Entre novamente.')
+        display_login_form()
+    else:
+        st.title('Painel Administrativo')
+        unstable = circuit_breaker.open_endpoints()
+        if unstable:
+            st.warning(
+                f'API instável em {", ".join(unstable)}: essas chamadas falham na hora '
+                'e as listas mostram os últimos dados disponíveis. Detalhes na aba Desempenho.'
+            )
+
+        lazy_tabs(
+            {
+                '📊 Gerenciar Inscrições': display_enrollment_manager,
+                '📈 Análises': display_analytics_manager,
+                '👤 Gerenciar Usuários': display_user_manager,
+                '📚 Gerenciar Turmas': display_class_manager,
+                '⚙️ Configurações': display_config_manager,
+                '⏱️ Desempenho': display_performance_manager,
+            },
+            key='admin_section',
+            keep=ENROLLMENT_FILTER_KEYS + ANALYTICS_FILTER_KEYS,
+        )
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from os import getenv
+
+from dotenv import load_dotenv
+from utils import metrics
+
+load_dotenv()
+# Tempo máximo que um aluno espera na fila antes de desistir (segundos)
+ADMISSION_MAX_WAIT = float(getenv('ADMISSION_MAX_WAIT', '120'))
+# Intervalo entre as atualizações da posição mostrada a quem espera (segundos)
+ADMISSION_POLL_INTERVAL = float(getenv('ADMISSION_POLL_INTERVAL', '0.5'))
+# Janela usada para calcular as admissões por segundo
+RATE_WINDOW = 10.0
+
+
+def limits_from_env(prefix, rate, burst, in_flight, queue):
+    """Limites de um controlador lidos de `<prefix>_RATE`, `_BURST`, `_IN_FLIGHT` e `_QUEUE`."""
+    return {
+        'rate': float(getenv(f'{prefix}_RATE', str(rate))),
+        'burst': int(getenv(f'{prefix}_BURST', str(burst))),
+        'max_in_flight': int(getenv(f'{prefix}_IN_FLIGHT', str(in_flight))),
+        'max_queue': int(getenv(f'{prefix}_QUEUE', str(queue))),
+    }
+
+
+class AdmissionRejected(Exception):
+    """A fila está cheia ou a espera passou do limite; a chamada não foi feita."""
+
+
+class AdmissionController:
+    """
+    Controle de admissão das chamadas de um endpoint, compartilhado por todas as
+    sessões do processo: um balde de fichas limita a taxa (`rate` por segundo,
+    com rajadas de até `burst`) e `max_in_flight` limita as chamadas em
+    andamento. Quem não pode entrar espera em uma fila por ordem de chegada,
+    limitada a `max_queue`; com a fila cheia, o pedido é recusado na hora.
+    """
+
+    def __init__(self, name, rate, burst, max_in_flight, max_queue, max_wait=ADMISSION_MAX_WAIT):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._queue = deque()
+        self._admitted_at = deque()
+        # Média móvel da duração das chamadas, para estimar a espera
+        self._service_seconds = 0.5
+        self._condition = threading.Condition()
+        self._counters = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timeouts': 0}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _try_admit(self, ticket, now):
+        if not self._queue or self._queue[0] is not ticket or self.in_flight >= self.max_in_flight:
+            return False
+        self._refill(now)
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self._queue.popleft()
+        self.in_flight += 1
+        self._counters['admitted'] += 1
+        self._admitted_at.append(now)
+        while now - self._admitted_at[0] > RATE_WINDOW:
+            self._admitted_at.popleft()
+        return True
+
+    def _estimate(self, position):
+        """Espera estimada (segundos) para quem está em `position` na fila, pelo limite mais restritivo."""
+        by_rate = position / self.rate if self.rate else 0
+        by_capacity = position * self._service_seconds / max(self.max_in_flight, 1)
+        return max(by_rate, by_capacity)
+
+    def _publish(self):
+        metrics.set_gauge('admission_queue', len(self._queue), endpoint=self.name)
+        metrics.set_gauge('admission_in_flight', self.in_flight, endpoint=self.name)
+
+    @contextmanager
+    def admit(self, on_wait=None):
+        """
+        Bloco `with` executado quando a chamada é admitida. Enquanto espera,
+        `on_wait(posição, espera_estimada)` é chamado a cada
+        `ADMISSION_POLL_INTERVAL` segundos (ex.: para mostrar a posição na
+        fila). Levanta `AdmissionRejected` com a fila cheia ou após `max_wait`.
+        """
+        ticket = object()
+        start = time.monotonic()
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                self._counters['rejected'] += 1
+                metrics.increment('admission', endpoint=self.name, result='rejected')
+                raise AdmissionRejected('Muitos alunos estão se inscrevendo agora. Tente novamente em alguns minutos.')
+            self._queue.append(ticket)
+            self._publish()
+            admitted = self._try_admit(ticket, start)
+            if not admitted:
+                self._counters['queued'] += 1
+
+        try:
+            while not admitted:
+                with self._condition:
+                    now = time.monotonic()
+                    admitted = self._try_admit(ticket, now)
+                    if admitted:
+                        break
+                    if now - start > self.max_wait:
+                        self._queue.remove(ticket)
+                        self._counters['timeouts'] += 1
+                        metrics.increment('admission', endpoint=self.name, result='timeout')
+                        raise AdmissionRejected('O tempo de espera na fila acabou. Tente novamente em instantes.')
+                    position = self._queue.index(ticket) + 1
+                    # Sem ficha, acorda quando a próxima estiver disponível
+                    refill_wait = (1 - self._tokens) / self.rate if self.rate and self._tokens < 1 else None
+                    self._condition.wait(min(filter(None, (refill_wait, ADMISSION_POLL_INTERVAL))))
+                if on_wait is not None:
+                    on_wait(position, self._estimate(position))
+        except BaseException:
+            # Inclui a interrupção do script pelo Streamlit (aluno saiu ou clicou de novo)
+            with self._condition:
+                if not admitted and ticket in self._queue:
+                    self._queue.remove(ticket)
+                self._publish()
+                self._condition.notify_all()
+            raise
+
+        waited = time.monotonic() - start
+        metrics.observe('admission_wait', waited, endpoint=self.name)
+        metrics.increment('admission', endpoint=self.name, result='admitted')
+        with self._condition:
+            self._publish()
+            # O próximo da fila passa a ser o primeiro e pode tentar entrar
+            self._condition.notify_all()
+        try:
+            yield waited
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.monotonic() - start - waited)
+                self._publish()
+                self._condition.notify_all()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._condition:
+            while self._admitted_at and now - self._admitted_at[0] > RATE_WINDOW:
+                self._admitted_at.popleft()
+            return {
+                'endpoint': self.name,
+                'queue_depth': len(self._queue),
+                'in_flight': self.in_flight,
+                'admitted_per_s': round(len(self._admitted_at) / RATE_WINDOW, 2),
+                **self._counters,
+                'rate_limit': self.rate,
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'avg_call_ms': round(1000 * self._service_seconds, 1),
+            }
+
+
+verification_gate = AdmissionController(
+    'verificacao', **limits_from_env('ADMISSION_VERIFY', rate=20, burst=20, in_flight=16, queue=300)
+)
+submission_gate = AdmissionController(
+    'inscricao', **limits_from_env('ADMISSION_SUBMIT', rate=10, burst=10, in_flight=8, queue=300)
+)
+
+
+def stats():
+    return [verification_gate.stats(), submission_gate.stats()]
@@ -0,0 +1,207 @@
+import threading
+import time
+import weakref
+from os import getenv
+
+import altair as alt
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from utils import api_client, metrics
+
+load_dotenv()
+# Agregados calculados pelo backend; se ele responder 404/405, são calculados a partir das inscrições
+ANALYTICS_ENDPOINT = getenv('ANALYTICS_ENDPOINT', '/enrollment/aggregates')
+# Limites das faixas de nota predita; a última faixa inclui o 10
+GRADE_BAND_EDGES = (0, 5, 6, 7, 8, 9, 10)
+GRADE_BANDS = tuple(f'{low}–{high}' for low, high in zip(GRADE_BAND_EDGES, GRADE_BAND_EDGES[1:]))
+NO_GRADE = 'Sem nota'
+# Dimensões das contagens, na ordem dos níveis do índice
+DIMENSIONS = ('turma', 'escolha', 'faixa_nota')
+MISSING = {'turma': 'Sem turma', 'escolha': 'Sem escolha'}
+DIMENSION_LABELS = {'turma': 'Turma', 'escolha': 'Escolha', 'faixa_nota': 'Nota predita', 'total': 'Inscrições'}
+
+_lock = threading.Lock()
+_by_dataset = weakref.WeakKeyDictionary()
+
+
+# --- CONTAGENS ---
+def empty_cube():
+    return pd.Series([], dtype='int64', index=pd.MultiIndex.from_tuples([], names=DIMENSIONS), name='total')
+
+
+def grade_bands(grades):
+    """Faixa de cada nota predita; notas ausentes ou fora de 0–10 ficam em `NO_GRADE`."""
+    bins = [*GRADE_BAND_EDGES[:-1], np.nextafter(GRADE_BAND_EDGES[-1], np.inf)]
+    bands = pd.cut(pd.to_numeric(grades, errors='coerce'), bins=bins, labels=GRADE_BANDS, right=False)
+    return bands.cat.add_categories([NO_GRADE]).fillna(NO_GRADE)
+
+
+def text_column(df, column):
+    if column not in df:
+        return pd.Series(MISSING[column], index=df.index, dtype='category')
+    return df[column].astype('string').fillna(MISSING[column]).astype('category')
+
+
+def count_groups(df):
+    """
+    Inscrições por turma, escolha e faixa de nota em uma única groupby
+    vetorizada. Retorna uma Series com um MultiIndex (`DIMENSIONS`) só com as
+    combinações presentes; os totais de cada dimensão saem da soma dos níveis.
+    """
+    if df is None or not len(df):
+        return empty_cube()
+    keys = pd.DataFrame(
+        {
+            'turma': text_column(df, 'turma'),
+            'escolha': text_column(df, 'escolha'),
+            'faixa_nota': grade_bands(df['nota_predita']) if 'nota_predita' in df else NO_GRADE,
+        }
+    )
+    counts = keys.groupby(list(DIMENSIONS), observed=True).size()
+    # Índice em texto: contagens de recortes diferentes se alinham pelos valores, não pelas categorias
+    counts.index = pd.MultiIndex.from_arrays(
+        [counts.index.get_level_values(level).astype(str) for level in DIMENSIONS], names=DIMENSIONS
+    )
+    return counts.rename('total').astype('int64')
+
+
+def apply_delta(cube, removed, added):
+    """Desconta as linhas `removed` e soma as `added`, sem recontar o conjunto inteiro."""
+    cube = cube.sub(count_groups(removed), fill_value=0).add(count_groups(added), fill_value=0)
+    return cube[cube > 0].astype('int64').rename('total')
+
+
+def cube_from_groups(groups):
+    """Converte a resposta do endpoint de agregados (`[{turma, escolha, faixa_nota, total}]`) no formato de `count_groups`."""
+    if not groups:
+        return empty_cube()
+    df = pd.DataFrame(groups)
+    for column in DIMENSIONS:
+        missing = MISSING.get(column, NO_GRADE)
+        df[column] = df[column].fillna(missing).astype(str) if column in df else missing
+    return df.groupby(list(DIMENSIONS))['total'].sum().rename('total').astype('int64')
+
+
+def breakdown(cube, dimension):
+    """Total por valor de `dimension`, com as faixas de nota na ordem das notas."""
+    totals = cube.groupby(level=dimension).sum()
+    if dimension == 'faixa_nota':
+        order = [*GRADE_BANDS, NO_GRADE] if NO_GRADE in totals.index else list(GRADE_BANDS)
+        totals = totals.reindex(order, fill_value=0)
+    return totals.rename('total').reset_index()
+
+
+def crosstab(cube, *dimensions):
+    """Totais pelas combinações de `dimensions` (ex.: turma e escolha), em formato longo para os gráficos."""
+    return cube.groupby(level=list(dimensions)).sum().rename('total').reset_index()
+
+
+# --- AGREGADOS ---
+class EnrollmentAggregates:
+    """
+    Contagens de um `EnrollmentDataset`, mantidas em dia com ele: após uma
+    sincronização incremental, só as linhas trocadas são descontadas e somadas;
+    a groupby sobre todas as inscrições roda só na carga completa.
+    """
+
+    def __init__(self):
+        self.revision = None
+        self.cube = empty_cube()
+        self.last_update = None
+        self._lock = threading.Lock()
+
+    def update(self, dataset):
+        """Atualiza as contagens até a revisão atual de `dataset` e as retorna."""
+        with self._lock:
+            revision, df, deltas = dataset.changes_since(self.revision)
+            if revision == self.revision:
+                return self.cube
+            start = time.perf_counter()
+            if deltas is None:
+                self.cube = count_groups(df)
+                mode, rows = 'full', len(df)
+            else:
+                for removed, added in deltas:
+                    self.cube = apply_delta(self.cube, removed, added)
+                mode, rows = 'delta', sum(len(removed) + len(added) for removed, added in deltas)
+            seconds = time.perf_counter() - start
+            self.revision = revision
+            self.last_update = {'mode': mode, 'rows': rows, 'seconds': seconds}
+            metrics.observe('analytics_update', seconds, mode=mode)
+            return self.cube
+
+
+def dataset_aggregates(dataset):
+    """Agregados de `dataset`, criados na primeira chamada e descartados junto com ele."""
+    with _lock:
+        aggregates = _by_dataset.get(dataset)
+        if aggregates is None:
+            aggregates = _by_dataset[dataset] = EnrollmentAggregates()
+        return aggregates
+
+
+def fetch_server_aggregates(session, semester):
+    """
+    Busca os agregados calculados pelo backend em `ANALYTICS_ENDPOINT`, que deve
+    responder `{"groups": [{"turma", "escolha", "faixa_nota", "total"}, ...]}`
+    com as faixas de `GRADE_BAND_EDGES`. Retorna `None` se o backend não oferece
+    o endpoint.
+    """
+    url = f'{session.base_url}{ANALYTICS_ENDPOINT}'
+    if not api_client.endpoint_supported('GET', url):
+        return None
+    params = {'query_semestre': semester, 'grade_bands': ','.join(map(str, GRADE_BAND_EDGES))}
+    response = session.get(ANALYTICS_ENDPOINT, params=params)
+    if not api_client.check_supported(response):
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+# --- GRÁFICOS ---
+# Os gráficos recebem só as contagens (dezenas de linhas), nunca as inscrições
+def _tooltip(*fields):
+    return [alt.Tooltip(field, title=DIMENSION_LABELS[field.split(':')[0]]) for field in fields]
+
+
+def turma_chart(cube):
+    data = crosstab(cube, 'turma', 'escolha')
+    return (
+        alt.Chart(data)
+        .mark_bar()
+        .encode(
+            x=alt.X('sum(total):Q', title=DIMENSION_LABELS['total']),
+            y=alt.Y('turma:N', sort='-x', title=DIMENSION_LABELS['turma']),
+            color=alt.Color('escolha:N', title=DIMENSION_LABELS['escolha'], legend=alt.Legend(orient='bottom')),
+            tooltip=_tooltip('turma:N', 'escolha:N', 'total:Q'),
+        )
+    )
+
+
+def choice_chart(cube):
+    data = breakdown(cube, 'escolha')
+    return (
+        alt.Chart(data)
+        .mark_arc(innerRadius=50)
+        .encode(
+            theta=alt.Theta('total:Q'),
+            color=alt.Color('escolha:N', title=DIMENSION_LABELS['escolha'], legend=alt.Legend(orient='bottom')),
+            tooltip=_tooltip('escolha:N', 'total:Q'),
+        )
+    )
+
+
+def grade_band_chart(cube):
+    data = crosstab(cube, 'faixa_nota', 'escolha')
+    order = [*GRADE_BANDS, NO_GRADE]
+    return (
+        alt.Chart(data)
+        .mark_bar()
+        .encode(
+            x=alt.X('faixa_nota:N', sort=order, title=DIMENSION_LABELS['faixa_nota']),
+            y=alt.Y('sum(total):Q', title=DIMENSION_LABELS['total']),
+            color=alt.Color('escolha:N', title=DIMENSION_LABELS['escolha'], legend=alt.Legend(orient='bottom')),
+            tooltip=_tooltip('faixa_nota:N', 'escolha:N', 'total:Q'),
+        )
+    )
@@ -0,0 +1,253 @@
+import threading
+import time
+from collections import defaultdict
+from http.cookiejar import DefaultCookiePolicy
+from os import getenv
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    Retrying,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+from utils import circuit_breaker, http_cache, metrics
+
+# --- CONFIGURAÇÃO DO CLIENTE ---
+load_dotenv()
+POOL_CONNECTIONS = int(getenv('API_POOL_CONNECTIONS', '10'))
+POOL_MAXSIZE = int(getenv('API_POOL_MAXSIZE', '50'))
+CONNECT_TIMEOUT = float(getenv('API_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(getenv('API_READ_TIMEOUT', '15'))
+GET_RETRIES = int(getenv('API_GET_RETRIES', '3'))
+RETRY_BACKOFF = float(getenv('API_RETRY_BACKOFF', '0.3'))
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+RETRY_STATUS_CODES = {502, 503, 504}
+# Respostas que indicam a API com problemas: contam como falha no disjuntor
+BREAKER_FAILURE_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_endpoint_stats = defaultdict(
+    lambda: {'requests': 0, 'errors': 0, 'retries': 0, 'total_seconds': 0.0}
+)
+# Endpoints opcionais que o backend respondeu com 404/405
+_unsupported_endpoints = set()
+
+
+# --- FUNÇÕES HELPER ---
+def get_session():
+    """
+    Retorna a sessão HTTP compartilhada pelo processo, criando-a na primeira chamada.
+
+    A sessão mantém um pool de conexões keep-alive por host e bloqueia o
+    armazenamento de cookies, já que é usada por todos os usuários do app.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    max_retries=0,
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def _endpoint_key(method, url):
+    return f'{method.upper()} {urlsplit(url).path or "/"}'
+
+
+def _record(key, seconds, attempts, failed):
+    with _stats_lock:
+        stats = _endpoint_stats[key]
+        stats['requests'] += 1
+        stats['retries'] += attempts - 1
+        stats['total_seconds'] += seconds
+        if failed:
+            stats['errors'] += 1
+
+
+def _fallback(cache_key, url):
+    """Última resposta boa de um GET em cache, para quando a API falha ou o circuito está aberto."""
+    return http_cache.response_cache.fallback(cache_key, url) if cache_key else None
+
+
+def request(method, url, timeout=None, retries=None, revalidate=True, **kwargs):
+    """
+    Faz uma requisição usando a sessão compartilhada.
+
+    Aplica os timeouts padrão de conexão e leitura e, para métodos idempotentes,
+    repete a chamada com backoff exponencial em falhas de conexão, timeouts e
+    respostas 502/503/504. Retorna o `requests.Response` da última tentativa.
+    A duração total é registrada em `metrics` com o endpoint, o status e se a
+    chamada veio de uma falha de cache.
+
+    Em GETs com `revalidate` aos endpoints de `http_cache.HTTP_CACHE_ENDPOINTS`,
+    respostas com `ETag`/`Last-Modified` ficam no cache em disco e as próximas
+    chamadas são condicionais: se a API responder 304, o corpo guardado é
+    devolvido como uma resposta 200.
+
+    Cada endpoint tem um disjuntor (`circuit_breaker`) e um orçamento de
+    latência, usado como timeout de leitura. Com o circuito aberto a chamada
+    falha na hora com `CircuitOpen`; nos GETs a `http_cache.HTTP_FALLBACK_ENDPOINTS`
+    (turmas e semestres), e quando a API está fora do ar, a última resposta boa
+    guardada é devolvida no lugar.
+    """
+    method = method.upper()
+    session = get_session()
+    path = urlsplit(url).path or '/'
+    timeout = timeout or (CONNECT_TIMEOUT, circuit_breaker.latency_budget(path, READ_TIMEOUT))
+    if retries is None:
+        retries = GET_RETRIES if method in IDEMPOTENT_METHODS else 1
+
+    retrying = Retrying(
+        stop=stop_after_attempt(max(retries, 1)),
+        wait=wait_exponential_jitter(initial=RETRY_BACKOFF, max=5),
+        retry=(
+            retry_if_exception_type((requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            | retry_if_result(lambda r: r.status_code in RETRY_STATUS_CODES)
+        ),
+        retry_error_callback=lambda state: state.outcome.result(),
+        reraise=True,
+    )
+    key = _endpoint_key(method, url)
+    read_budget = timeout[1] if isinstance(timeout, tuple) else timeout
+    attempt_seconds = []
+
+    def attempt(*args, **attempt_kwargs):
+        # Cada tentativa é medida sozinha: o orçamento de latência vale por tentativa, sem o backoff entre elas
+        start = time.perf_counter()
+        try:
+            return session.request(*args, **attempt_kwargs)
+        finally:
+            attempt_seconds.append(time.perf_counter() - start)
+            metrics.observe('api_attempt', attempt_seconds[-1], endpoint=key)
+
+    cache_key = None
+    headers = kwargs.pop('headers', None) or {}
+    if method == 'GET' and revalidate and http_cache.cacheable(url):
+        cache_key = http_cache.request_key(method, url, kwargs.get('params'))
+        headers = {**headers, **http_cache.response_cache.conditional_headers(cache_key)}
+
+    breaker = circuit_breaker.get(key)
+    cache = 'miss' if metrics.current_cache() else 'none'
+    ticket = breaker.allow()
+    if ticket is None:
+        fallback = _fallback(cache_key, url)
+        metrics.observe('api_request', 0.0, endpoint=key, status='circuit_open', cache=cache)
+        if fallback is not None:
+            return fallback
+        raise circuit_breaker.CircuitOpen(key, breaker.retry_after())
+
+    start = time.perf_counter()
+    status = 'error'
+    failed = True
+    healthy = False
+    try:
+        try:
+            response = retrying(attempt, method, url, timeout=timeout, headers=headers, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            fallback = _fallback(cache_key, url)
+            if fallback is None:
+                raise
+            status = 'fallback'
+            return fallback
+        status = response.status_code
+        failed = status >= 400
+        healthy = status not in BREAKER_FAILURE_STATUS
+        if not healthy:
+            fallback = _fallback(cache_key, url)
+            if fallback is not None:
+                status = 'fallback'
+                return fallback
+        if cache_key and status == 304:
+            restored = http_cache.response_cache.restore(cache_key, response)
+            if restored is None:
+                # A entrada saiu do cache depois de enviada a revalidação: busca o corpo de novo
+                headers = {k: v for k, v in headers.items() if k not in ('If-None-Match', 'If-Modified-Since')}
+                restored = retrying(attempt, method, url, timeout=timeout, headers=headers, **kwargs)
+            response = restored
+        elif cache_key:
+            http_cache.response_cache.store(cache_key, response)
+        return response
+    except requests.exceptions.RequestException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        attempts = retrying.statistics.get('attempt_number', 1)
+        _record(key, seconds, attempts, failed)
+        # Lenta é a tentativa que deu a resposta, não a soma das tentativas e esperas
+        breaker.record(ticket, healthy, slow=bool(attempt_seconds) and attempt_seconds[-1] > read_budget)
+        metrics.observe('api_request', seconds, endpoint=key, status=status, cache=cache)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def endpoint_supported(method, url):
+    """Indica se um endpoint opcional ainda não foi recusado pelo backend."""
+    return _endpoint_key(method, url) not in _unsupported_endpoints
+
+
+def check_supported(response):
+    """
+    Marca o endpoint da resposta como não suportado se o backend respondeu 404/405.
+    Retorna False nesse caso, para o chamador cair no caminho alternativo.
+    """
+    if response.status_code in (404, 405):
+        _unsupported_endpoints.add(_endpoint_key(response.request.method, response.request.url))
+        return False
+    return True
+
+
+def pool_stats():
+    """
+    Retorna estatísticas do pool de conexões.
+
+    `endpoints` traz, por método e caminho, o total de requisições, erros,
+    novas tentativas e latência média. `hosts` traz, por pool urllib3, quantas
+    conexões foram abertas e quantas requisições elas atenderam.
+    """
+    with _stats_lock:
+        endpoints = {
+            key: {
+                **stats,
+                'avg_ms': round(1000 * stats['total_seconds'] / stats['requests'], 1)
+                if stats['requests']
+                else 0.0,
+            }
+            for key, stats in _endpoint_stats.items()
+        }
+
+    hosts = {}
+    adapter = get_session().get_adapter('http://')
+    for pool_key in list(adapter.poolmanager.pools.keys()):
+        pool = adapter.poolmanager.pools.get(pool_key)
+        if pool is None:
+            continue
+        hosts[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+            'connections_opened': pool.num_connections,
+            'requests_served': pool.num_requests,
+            'idle_connections': pool.pool.qsize() if pool.pool else 0,
+            'max_connections': POOL_MAXSIZE,
+        }
+    return {'endpoints': endpoints, 'hosts': hosts}
@@ -0,0 +1,149 @@
+import threading
+from os import getenv
+
+import requests
+from dotenv import load_dotenv
+from utils import api_client, metrics
+
+load_dotenv()
+LOGIN_ENDPOINT = '/users/login'
+# Renovação do token com o cookie de sessão; se o backend não a oferecer (404/405), faz um novo login
+AUTH_REFRESH_ENDPOINT = getenv('AUTH_REFRESH_ENDPOINT', '/users/refresh')
+SESSION_COOKIE = 'session-token'
+
+
+class AuthenticationFailed(Exception):
+    """A API não devolveu o token e o cookie de sessão esperados no login."""
+
+
+class SessionExpired(requests.exceptions.RequestException):
+    """O token expirou e não foi possível renová-lo nem entrar de novo; é preciso um novo login."""
+
+
+class AdminSession:
+    """
+    Sessão autenticada de um administrador sobre o pool de conexões do
+    `api_client`: guarda o token e os cookies do login e os envia em cada
+    chamada.
+
+    Uma resposta 401 faz a sessão renovar o token (ou entrar de novo com as
+    credenciais do login) uma única vez e repetir a chamada. Chamadas
+    concorrentes que recebem 401 esperam a mesma renovação em vez de cada uma
+    fazer o seu login. As credenciais ficam só na memória do servidor, no
+    objeto guardado em `st.session_state`.
+
+    Os métodos não usam o Streamlit, então a sessão pode ser passada para
+    funções que rodam nos pools de threads.
+    """
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url
+        self.username = username
+        self._password = password
+        self.token = None
+        self.cookies = {}
+        # Aumenta a cada novo token; identifica se um 401 já foi tratado por outra chamada
+        self.generation = 0
+        self.expired = False
+        self._lock = threading.Lock()
+        self._counters = {'logins': 0, 'refreshes': 0, 'replays': 0, 'failures': 0}
+
+    @classmethod
+    def open(cls, base_url, username, password):
+        """Faz o login e retorna a sessão. Levanta `HTTPError` ou `AuthenticationFailed` se for recusado."""
+        session = cls(base_url, username, password)
+        session._login()
+        return session
+
+    def _set_token(self, token, cookies):
+        self.token = token
+        self.cookies = cookies
+        self.generation += 1
+        self.expired = False
+
+    def _login(self):
+        response = api_client.post(
+            f'{self.base_url}{LOGIN_ENDPOINT}', data={'name': self.username, 'password': self._password}
+        )
+        response.raise_for_status()
+        token = response.json().get('token')
+        cookies = response.cookies.get_dict()
+        if not token or SESSION_COOKIE not in cookies:
+            raise AuthenticationFailed(self.username)
+        self._set_token(token, cookies)
+        self._counters['logins'] += 1
+        metrics.increment('admin_auth', result='login')
+
+    def _refresh(self):
+        url = f'{self.base_url}{AUTH_REFRESH_ENDPOINT}'
+        if not AUTH_REFRESH_ENDPOINT or not api_client.endpoint_supported('POST', url):
+            return False
+        try:
+            response = api_client.post(url, headers=self._headers(), cookies=self.cookies)
+        except requests.exceptions.RequestException:
+            return False
+        if not api_client.check_supported(response) or not response.ok:
+            return False
+        token = response.json().get('token')
+        if not token:
+            return False
+        self._set_token(token, {**self.cookies, **response.cookies.get_dict()})
+        self._counters['refreshes'] += 1
+        metrics.increment('admin_auth', result='refresh')
+        return True
+
+    def reauthenticate(self, stale_generation):
+        """
+        Obtém um novo token após um 401 recebido com o token `stale_generation`.
+        Só a primeira chamada renova; as demais esperam no lock e reaproveitam o
+        resultado. Retorna se há um token válido para repetir a chamada.
+        """
+        with self._lock:
+            if self.expired:
+                return False
+            if self.generation != stale_generation:
+                return True
+            if self._refresh():
+                return True
+            try:
+                self._login()
+                return True
+            except (requests.exceptions.RequestException, AuthenticationFailed, ValueError):
+                self.expired = True
+                self._counters['failures'] += 1
+                metrics.increment('admin_auth', result='failed')
+                return False
+
+    def _headers(self):
+        return {'Authorization': f'Bearer {self.token}'}
+
+    def _snapshot(self):
+        # Token, cookies e geração lidos juntos, sem uma renovação pela metade
+        with self._lock:
+            if self.expired:
+                raise SessionExpired('Sessão expirada. Entre novamente.')
+            return self.generation, self._headers(), self.cookies
+
+    def request(self, method, endpoint, reauthenticate=True, **kwargs):
+        """
+        Faz uma chamada autenticada a `endpoint` (caminho relativo à API) pelo
+        `api_client`. Em um 401, renova o token uma vez e repete a chamada; com
+        `reauthenticate=False` (atualizações em segundo plano, sem o administrador
+        na página), devolve o 401. Levanta `SessionExpired` se a sessão já expirou.
+        """
+        url = f'{self.base_url}{endpoint}'
+        extra_headers = kwargs.pop('headers', None) or {}
+        generation, headers, cookies = self._snapshot()
+        response = api_client.request(method, url, headers={**extra_headers, **headers}, cookies=cookies, **kwargs)
+        if response.status_code != 401 or not reauthenticate or not self.reauthenticate(generation):
+            return response
+        generation, headers, cookies = self._snapshot()
+        self._counters['replays'] += 1
+        metrics.increment('admin_auth', result='replay')
+        return api_client.request(method, url, headers={**extra_headers, **headers}, cookies=cookies, **kwargs)
+
+    def get(self, endpoint, **kwargs):
+        return self.request('GET', endpoint, **kwargs)
+
+    def stats(self):
+        return {'user': self.username, 'token_generation': self.generation, 'expired': self.expired, **self._counters}
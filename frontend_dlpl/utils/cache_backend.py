@@ -0,0 +1,359 @@
+import json
+import logging
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from os import getenv
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from dotenv import load_dotenv
+from utils import metrics
+
+load_dotenv()
+# memory:// (padrão, só este processo), sqlite:///caminho/relativo.sqlite3 ou sqlite:////caminho/absoluto
+# (arquivo em um volume compartilhado) ou redis://[:senha@]host:porta/db (qualquer servidor que fale o
+# protocolo do Redis)
+CACHE_BACKEND_URL = getenv('CACHE_BACKEND_URL', 'memory://')
+# Intervalo em que cada réplica confere se outra invalidou um namespace (segundos)
+CACHE_VERSION_CHECK = float(getenv('CACHE_VERSION_CHECK', '1'))
+CACHE_KEY_PREFIX = getenv('CACHE_KEY_PREFIX', 'dlpl')
+REDIS_TIMEOUT = float(getenv('CACHE_REDIS_TIMEOUT', '0.5'))
+REDIS_POOL_SIZE = int(getenv('CACHE_REDIS_POOL_SIZE', '8'))
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackendError(Exception):
+    """Falha ao falar com o backend de cache; quem chama trata como falha do cache."""
+
+
+# --- BACKENDS ---
+class MemoryBackend:
+    """Chaves na memória do processo, com expiração. Cada réplica tem o seu."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] is not None and item[1] <= time.time():
+                del self._data[key]
+                return None
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            if len(self._data) % 256 == 0:
+                now = time.time()
+                for stale in [k for k, (_, expires) in self._data.items() if expires is not None and expires <= now]:
+                    del self._data[stale]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, ('0', None))[0]) + 1
+            self._data[key] = (str(value), None)
+            return value
+
+
+class SQLiteBackend:
+    """
+    Chaves em um arquivo SQLite (modo WAL), que pode ficar em um volume
+    compartilhado pelas réplicas de uma mesma máquina ou de um NFS com lock.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)'
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _execute(self, sql, params=()):
+        try:
+            with self._lock:
+                return self._connection.execute(sql, params).fetchone()
+        except sqlite3.Error as e:
+            raise CacheBackendError(e) from e
+
+    def get(self, key):
+        row = self._execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)', (key, time.time())
+        )
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        self._execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', (key, value, now + ttl if ttl else None))
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self._execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+
+    def delete(self, key):
+        self._execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def incr(self, key):
+        # O UPSERT é atômico: réplicas que invalidam ao mesmo tempo não perdem incrementos
+        row = self._execute(
+            "INSERT INTO cache VALUES (?, '1', NULL) "
+            'ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1 RETURNING value',
+            (key,),
+        )
+        return int(row[0])
+
+
+class RedisBackend:
+    """
+    Cliente mínimo do protocolo do Redis (RESP), só com os comandos usados
+    pelo cache, sem dependências além da biblioteca padrão. As conexões ficam
+    em um pool pequeno; uma conexão que falha é descartada.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url, timeout=REDIS_TIMEOUT, pool_size=REDIS_POOL_SIZE):
+        parts = urlsplit(url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 6379
+        self.db = int(parts.path.strip('/') or 0)
+        self.password = unquote(parts.password) if parts.password else None
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        connection = (sock, sock.makefile('rb'))
+        try:
+            if self.password:
+                self._command(connection, 'AUTH', self.password)
+            if self.db:
+                self._command(connection, 'SELECT', self.db)
+        except BaseException:
+            sock.close()
+            raise
+        return connection
+
+    @staticmethod
+    def _read(reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('conexão fechada pelo servidor')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise CacheBackendError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            size = int(payload)
+            return None if size < 0 else reader.read(size + 2)[:-2].decode()
+        if kind == b'*':
+            size = int(payload)
+            return None if size < 0 else [RedisBackend._read(reader) for _ in range(size)]
+        raise CacheBackendError(f'resposta inválida: {line!r}')
+
+    @classmethod
+    def _command(cls, connection, *args):
+        sock, reader = connection
+        encoded = [str(arg).encode() for arg in args]
+        sock.sendall(b''.join([f'*{len(encoded)}\r\n'.encode()] + [b'$%d\r\n%s\r\n' % (len(arg), arg) for arg in encoded]))
+        return cls._read(reader)
+
+    def execute(self, *args):
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = None
+        # Só volta ao pool a conexão que leu a resposta inteira (inclusive uma resposta de erro)
+        reusable = False
+        try:
+            if connection is None:
+                connection = self._connect()
+            result = self._command(connection, *args)
+            reusable = True
+            return result
+        except CacheBackendError:
+            reusable = True
+            raise
+        except (OSError, ValueError) as e:
+            raise CacheBackendError(e) from e
+        finally:
+            if connection is not None:
+                self._release(connection, reusable)
+
+    def _release(self, connection, reusable):
+        if reusable:
+            try:
+                self._pool.put_nowait(connection)
+                return
+            except queue.Full:
+                pass
+        connection[0].close()
+
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.execute('SET', key, value, 'PX', max(int(ttl * 1000), 1))
+        else:
+            self.execute('SET', key, value)
+
+    def delete(self, key):
+        self.execute('DEL', key)
+
+    def incr(self, key):
+        return int(self.execute('INCR', key))
+
+
+def backend_from_url(url):
+    scheme = urlsplit(url).scheme
+    if scheme in ('', 'memory'):
+        return MemoryBackend()
+    if scheme == 'sqlite':
+        try:
+            return SQLiteBackend(url.removeprefix('sqlite:///'))
+        except (OSError, sqlite3.Error) as e:
+            # Caminho inválido ou sem permissão: o cache segue só na memória, em vez de derrubar a página
+            logger.warning('Backend de cache SQLite indisponível (%s), usando a memória: %s', url, e)
+            return MemoryBackend()
+    if scheme == 'redis':
+        return RedisBackend(url)
+    raise ValueError(f'CACHE_BACKEND_URL não suportada: {url}')
+
+
+# --- NAMESPACES ---
+class Namespace:
+    """
+    Grupo de chaves invalidado de uma vez. `invalidate` incrementa a versão do
+    namespace no backend; como a versão faz parte de cada chave, todas as
+    réplicas deixam de enxergar as entradas antigas (que expiram pelo TTL).
+    """
+
+    def __init__(self, store, name, ttl=None):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+
+    def _key(self, key):
+        return f'{CACHE_KEY_PREFIX}:{self.name}:{self.version()}:{key}'
+
+    def version(self):
+        return self.store.version(self.name)
+
+    def get(self, key):
+        """Retorna (valor, idade em segundos) ou `None`. Falhas do backend contam como ausência."""
+        raw = self.store.call('get', self._key(key))
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry['value'], time.time() - entry['stored_at']
+
+    def set(self, key, value, ttl=None):
+        payload = json.dumps({'value': value, 'stored_at': time.time()})
+        self.store.call('set', self._key(key), payload, ttl or self.ttl)
+
+    def delete(self, key):
+        self.store.call('delete', self._key(key))
+
+    def invalidate(self):
+        self.store.invalidate(self.name)
+
+    def get_or_fetch(self, key, fetch):
+        """Valor de `key`, buscado com `fetch()` na falta; resultados `None` (erro na API) não são guardados."""
+        start = time.perf_counter()
+        entry = self.get(key)
+        cache = f'{self.store.backend.name}:{self.name}'
+        if entry is not None:
+            metrics.observe('cache_lookup', time.perf_counter() - start, cache=cache, result='hit')
+            return entry[0]
+        with metrics.timer('cache_lookup', cache=cache, result='miss'), metrics.cache_scope(cache):
+            value = fetch()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+
+class CacheStore:
+    """
+    Backend de cache do processo com namespaces versionados. As versões lidas
+    do backend ficam na memória por `CACHE_VERSION_CHECK` segundos, para não
+    custar uma ida ao backend a cada leitura; a réplica que invalida atualiza
+    a sua na hora.
+    """
+
+    def __init__(self, backend, version_check=CACHE_VERSION_CHECK):
+        self.backend = backend
+        self.version_check = version_check
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._counters = {'errors': 0, 'invalidations': 0, 'version_checks': 0}
+
+    def namespace(self, name, ttl=None):
+        return Namespace(self, name, ttl)
+
+    def call(self, operation, *args):
+        try:
+            return getattr(self.backend, operation)(*args)
+        except CacheBackendError as e:
+            with self._lock:
+                self._counters['errors'] += 1
+            metrics.increment('cache_backend_error', backend=self.backend.name, operation=operation)
+            logger.warning('Falha no backend de cache (%s %s): %s', self.backend.name, operation, e)
+            return None
+
+    def version(self, name):
+        now = time.monotonic()
+        cached = self._versions.get(name)
+        if cached is not None and now - cached[1] < self.version_check:
+            return cached[0]
+        raw = self.call('get', f'{CACHE_KEY_PREFIX}:version:{name}')
+        # Sem resposta do backend, mantém a última versão conhecida
+        version = int(raw) if raw is not None else (cached[0] if cached else 0)
+        with self._lock:
+            self._versions[name] = (version, now)
+            self._counters['version_checks'] += 1
+        return version
+
+    def invalidate(self, name):
+        version = self.call('incr', f'{CACHE_KEY_PREFIX}:version:{name}')
+        with self._lock:
+            self._counters['invalidations'] += 1
+            if version is not None:
+                self._versions[name] = (version, time.monotonic())
+            else:
+                # Backend fora do ar: ao menos esta réplica descarta as entradas
+                self._versions.pop(name, None)
+        metrics.increment('cache_invalidation', namespace=name)
+
+    def stats(self):
+        with self._lock:
+            versions = {name: version for name, (version, _) in self._versions.items()}
+            return {
+                'backend': self.backend.name,
+                **self._counters,
+                'namespaces': ', '.join(f'{name} v{version}' for name, version in sorted(versions.items())),
+            }
+
+
+cache_store = CacheStore(backend_from_url(CACHE_BACKEND_URL))
@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import deque
+from os import getenv
+
+import requests
+from dotenv import load_dotenv
+from utils import metrics
+
+load_dotenv()
+# Últimas chamadas consideradas por endpoint e fração de falhas que abre o circuito
+BREAKER_WINDOW = int(getenv('BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(getenv('BREAKER_MIN_CALLS', '5'))
+BREAKER_ERROR_RATIO = float(getenv('BREAKER_ERROR_RATIO', '0.5'))
+# Tempo com o circuito aberto antes de deixar passar uma chamada de teste (segundos)
+BREAKER_OPEN_SECONDS = float(getenv('BREAKER_OPEN_SECONDS', '30'))
+# Chamadas simultâneas por endpoint; as excedentes falham na hora (0 desativa o limite)
+BREAKER_MAX_IN_FLIGHT = int(getenv('BREAKER_MAX_IN_FLIGHT', '32'))
+
+
+def parse_budgets(value):
+    """Lê 'prefixo=segundos,...' em uma lista (prefixo, segundos), dos prefixos mais longos aos mais curtos."""
+    budgets = []
+    for item in value.split(','):
+        prefix, _, seconds = item.partition('=')
+        if prefix.strip() and seconds.strip():
+            budgets.append((prefix.strip(), float(seconds)))
+    return sorted(budgets, key=lambda budget: len(budget[0]), reverse=True)
+
+
+# Orçamento de latência por endpoint (segundos): é o timeout de leitura e chamadas mais lentas contam como falha
+API_LATENCY_BUDGETS = parse_budgets(
+    getenv(
+        'API_LATENCY_BUDGETS',
+        '/enrollment/verify-cpf-by-name=5,/enrollment/entry-info=5,/enrollment/courses=5,'
+        '/turma/=5,/config/=5,/users/=10',
+    )
+)
+
+# Fichas de `CircuitBreaker.allow`
+CALL = 'call'
+PROBE = 'probe'
+
+_lock = threading.Lock()
+_breakers = {}
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """Chamada recusada sem ir à API: o circuito do endpoint está aberto ou no limite de chamadas simultâneas."""
+
+    def __init__(self, endpoint, retry_after=None):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        wait = f' Tente novamente em {retry_after:.0f}s.' if retry_after else ' Tente novamente em instantes.'
+        super().__init__('O sistema está sobrecarregado ou instável no momento.' + wait)
+
+
+def latency_budget(path, default):
+    for prefix, seconds in API_LATENCY_BUDGETS:
+        if path.startswith(prefix):
+            return seconds
+    return default
+
+
+class CircuitBreaker:
+    """
+    Disjuntor de um endpoint. Fechado, deixa as chamadas passarem e guarda o
+    resultado das últimas `window`; com pelo menos `min_calls` e uma fração de
+    falhas (erros de conexão, timeouts, 5xx, 429 ou respostas acima do
+    orçamento de latência) de `error_ratio`, abre. Aberto, recusa as chamadas
+    por `open_seconds`; depois deixa passar uma única chamada de teste
+    (meio-aberto), que fecha o circuito se der certo ou o reabre se falhar.
+    """
+
+    def __init__(self, endpoint, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 error_ratio=BREAKER_ERROR_RATIO, open_seconds=BREAKER_OPEN_SECONDS,
+                 max_in_flight=BREAKER_MAX_IN_FLIGHT):
+        self.endpoint = endpoint
+        self.min_calls = min_calls
+        self.error_ratio = error_ratio
+        self.open_seconds = open_seconds
+        self.max_in_flight = max_in_flight
+        self.state = 'closed'
+        self.opened_at = None
+        self.in_flight = 0
+        self._results = deque(maxlen=window)
+        self._probing = False
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'failures': 0, 'slow': 0, 'rejected': 0, 'opened': 0}
+
+    def _transition(self, state):
+        self.state = state
+        metrics.increment('breaker_transition', endpoint=self.endpoint, state=state)
+
+    def allow(self):
+        """
+        Reserva uma vaga para a chamada. Retorna `None` se ela deve falhar na
+        hora; senão, a ficha (`PROBE` para a chamada de teste do meio-aberto,
+        `CALL` para as demais) a devolver em `record`.
+        """
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self._counters['rejected'] += 1
+                    return None
+                self._transition('half_open')
+            if self.state == 'half_open':
+                if self._probing:
+                    self._counters['rejected'] += 1
+                    return None
+                self._probing = True
+                ticket = PROBE
+            elif self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self._counters['rejected'] += 1
+                return None
+            else:
+                ticket = CALL
+            self.in_flight += 1
+            return ticket
+
+    def record(self, ticket, success, slow=False):
+        """
+        Registra o resultado de uma chamada liberada por `allow`. Só a chamada
+        de teste (`ticket` igual a `PROBE`) fecha ou reabre o circuito; chamadas
+        liberadas antes de ele abrir que terminam durante o teste só entram na janela.
+        """
+        failed = not success or slow
+        with self._lock:
+            self.in_flight -= 1
+            self._counters['calls'] += 1
+            self._counters['failures'] += not success
+            self._counters['slow'] += slow
+            if ticket is PROBE:
+                self._probing = False
+                if failed:
+                    self._open()
+                else:
+                    self._results.clear()
+                    self._transition('closed')
+                return
+            self._results.append(failed)
+            if self.state == 'closed' and len(self._results) >= self.min_calls:
+                if sum(self._results) / len(self._results) >= self.error_ratio:
+                    self._open()
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self._counters['opened'] += 1
+        self._transition('open')
+
+    def retry_after(self):
+        if self.state != 'open':
+            return None
+        return max(self.open_seconds - (time.monotonic() - self.opened_at), 0)
+
+    def stats(self):
+        with self._lock:
+            recent = len(self._results)
+            return {
+                'endpoint': self.endpoint,
+                'state': self.state,
+                'error_ratio': round(sum(self._results) / recent, 2) if recent else 0.0,
+                'in_flight': self.in_flight,
+                **self._counters,
+                'retry_in_s': round(self.retry_after(), 1) if self.state == 'open' else None,
+            }
+
+
+def get(endpoint):
+    """Disjuntor de `endpoint` ('MÉTODO caminho'), criado na primeira chamada."""
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.setdefault(endpoint, CircuitBreaker(endpoint))
+    return breaker
+
+
+def states():
+    """Estado de cada disjuntor, os abertos primeiro."""
+    with _lock:
+        breakers = list(_breakers.values())
+    order = {'open': 0, 'half_open': 1, 'closed': 2}
+    return sorted((breaker.stats() for breaker in breakers), key=lambda row: (order[row['state']], row['endpoint']))
+
+
+def open_endpoints():
+    with _lock:
+        return [endpoint for endpoint, breaker in _breakers.items() if breaker.state != 'closed']
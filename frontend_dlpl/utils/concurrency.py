@@ -0,0 +1,60 @@
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from os import getenv
+
+API_MAX_WORKERS = int(getenv('API_MAX_WORKERS', '32'))
+
+# Pool compartilhado pelo processo: limita quantas chamadas à API rodam em paralelo
+_executor = ThreadPoolExecutor(max_workers=API_MAX_WORKERS, thread_name_prefix='dlpl-api')
+
+
+def submit(call, *args, **kwargs):
+    """Agenda `call` no pool compartilhado e retorna o `Future`."""
+    return _executor.submit(call, *args, **kwargs)
+
+
+def run_all(calls):
+    """
+    Executa as funções sem argumentos de `calls` em paralelo e retorna, na mesma
+    ordem, uma lista de pares (resultado, exceção), com um dos dois sempre `None`.
+
+    As funções rodam fora da thread do script, portanto não podem acessar
+    `st.session_state` nem chamar elementos do Streamlit.
+    """
+    futures = [_executor.submit(call) for call in calls]
+    results = []
+    for future in futures:
+        try:
+            results.append((future.result(), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def map_bounded(call, items, max_parallel):
+    """
+    Agenda `call(item)` para cada item, com no máximo `max_parallel` chamadas
+    em paralelo, e retorna um dict item -> `Future` sem esperar os resultados.
+    """
+    futures = {item: Future() for item in items}
+    # A fila leva o próprio Future: o chamador pode remover itens do dict retornado
+    pending = queue.SimpleQueue()
+    for item, future in futures.items():
+        pending.put((item, future))
+
+    def worker():
+        while True:
+            try:
+                item, future = pending.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(call(item))
+            except Exception as e:
+                future.set_exception(e)
+
+    for _ in range(min(max_parallel, len(futures))):
+        _executor.submit(worker)
+    return futures
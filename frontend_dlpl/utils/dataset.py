@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from unidecode import unidecode
+from utils import metrics
+
+# Colunas com poucos valores distintos, guardadas como `category` (um código por linha)
+CATEGORY_COLUMNS = ('semestre', 'turma', 'escolha', 'curso')
+STRING_DTYPE = 'string[pyarrow]'
+# Chaves possíveis de uma inscrição, na ordem de preferência
+KEY_CANDIDATES = (('id',), ('_id',), ('cpf', 'curso', 'semestre'))
+# Sincronizações guardadas para quem acompanha o conjunto de forma incremental (ex.: agregados)
+DELTA_HISTORY = 16
+
+
+class DatasetUnavailable(Exception):
+    """A API não retornou as inscrições; o erro já foi mostrado por quem fez a chamada."""
+
+
+# --- FUNÇÕES HELPER ---
+def compact_frame(rows):
+    """
+    Monta o DataFrame das inscrições com tipos compactos: colunas repetitivas
+    como `category`, textos como strings do Arrow e inteiros no menor tipo que
+    os comporta (floats ficam em 64 bits, para não alterar as notas exibidas e
+    exportadas). Retorna o DataFrame e o tamanho que ele teria com os tipos padrão.
+    """
+    df = pd.DataFrame(rows)
+    object_bytes = int(df.memory_usage(deep=True).sum())
+    return compact_dtypes(df), object_bytes
+
+
+def compact_dtypes(df):
+    for column in df.columns:
+        series = df[column]
+        if column in CATEGORY_COLUMNS:
+            df[column] = series.astype('category')
+        elif series.dtype == object:
+            df[column] = series.astype(STRING_DTYPE)
+        elif pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast='integer')
+    return df
+
+
+def key_columns(df):
+    """Colunas que identificam uma inscrição, usadas para mesclar as alterações."""
+    for candidate in KEY_CANDIDATES:
+        if all(column in df for column in candidate):
+            return list(candidate)
+    return None
+
+
+def row_keys(df, columns):
+    if len(columns) == 1:
+        return pd.Index(df[columns[0]].astype(str))
+    return pd.MultiIndex.from_frame(df[columns].astype(str))
+
+
+class EnrollmentDataset:
+    """
+    Inscrições de um semestre carregadas uma única vez em um DataFrame compacto,
+    filtradas localmente com máscaras vetorizadas em vez de uma nova consulta à API.
+
+    Com o `cursor` devolvido pela API (`sync_cursor`), `sync` busca só as
+    inscrições alteradas desde a última sincronização e as mescla pela chave.
+    `revision` aumenta a cada mudança no conjunto; `changes_since` devolve as
+    linhas trocadas desde uma revisão, para quem mantém dados derivados.
+    """
+
+    def __init__(self, rows, cursor=None):
+        start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.revision = 0
+        self._deltas = deque(maxlen=DELTA_HISTORY)
+        self._replace(rows, cursor)
+        self.build_seconds = time.perf_counter() - start
+        self.last_sync = {'mode': 'full', 'changed': len(self.df), 'deleted': 0}
+        metrics.observe('dataframe_build', self.build_seconds, view='inscricoes_compactas')
+
+    def _replace(self, rows, cursor):
+        self.df, self.object_bytes = compact_frame(rows)
+        self.memory_bytes = int(self.df.memory_usage(deep=True).sum())
+        self.cursor = cursor
+        self.loaded_at = self.synced_at = time.time()
+        self.revision += 1
+        self._deltas.clear()
+
+    def _merge(self, rows, deleted, cursor):
+        df = self.df
+        columns = key_columns(df)
+        changed, _ = compact_frame(rows)
+        if columns is None or (len(changed) and key_columns(changed) != columns):
+            return False
+        updated = np.zeros(len(df), dtype=bool)
+        removed = np.zeros(len(df), dtype=bool)
+        if len(changed):
+            updated = row_keys(df, columns).isin(row_keys(changed, columns))
+        if deleted and len(columns) == 1:
+            removed = row_keys(df, columns).isin([str(key) for key in deleted]) & ~updated
+        drop = updated | removed
+        if len(changed) or drop.any():
+            # Categorias diferentes viram `object` no concat; os tipos são compactados de novo
+            self.df = compact_dtypes(pd.concat([df[~drop], changed], ignore_index=True))
+            self.memory_bytes = int(self.df.memory_usage(deep=True).sum())
+            self.revision += 1
+            self._deltas.append((self.revision, df[drop], changed))
+        self.cursor = cursor
+        self.synced_at = time.time()
+        self.last_sync = {'mode': 'delta', 'changed': len(changed), 'deleted': int(removed.sum())}
+        return True
+
+    def sync(self, fetch_changes, fetch_full):
+        """
+        Atualiza o conjunto com as inscrições alteradas desde `cursor`.
+
+        `fetch_changes(cursor)` retorna o JSON da API ou `None` se o cursor foi
+        recusado; nesse caso, sem cursor ou sem uma chave para mesclar, o
+        conjunto é recarregado inteiro com `fetch_full()`. Retorna 'delta',
+        'full' ou `None` se a recarga completa também falhou.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            mode = None
+            if self.cursor is not None:
+                data = fetch_changes(self.cursor)
+                if data is not None and 'sync_cursor' in data:
+                    if self._merge(data.get('data', []), data.get('deleted', []), data['sync_cursor']):
+                        mode = 'delta'
+                elif data is not None:
+                    # O backend ignorou o cursor e devolveu a lista completa
+                    self._replace(data.get('data', []), None)
+                    mode = 'full'
+            if mode is None:
+                data = fetch_full()
+                if data is None:
+                    return None
+                self._replace(data.get('data', []), data.get('sync_cursor'))
+                mode = 'full'
+            if mode == 'full':
+                self.last_sync = {'mode': 'full', 'changed': len(self.df), 'deleted': 0}
+            metrics.observe('enrollment_sync', time.perf_counter() - start, mode=mode)
+            return mode
+
+    def changes_since(self, revision):
+        """
+        Retorna `(revisão atual, df, alterações)`, lidos juntos. `alterações` é a
+        lista de pares (linhas removidas, linhas incluídas) de cada sincronização
+        depois de `revision`, ou `None` se elas não estão mais disponíveis (recarga
+        completa ou histórico esgotado) e quem chama deve recalcular a partir de `df`.
+        """
+        with self._lock:
+            if revision is None:
+                return self.revision, self.df, None
+            deltas = [(removed, added) for number, removed, added in self._deltas if number > revision]
+            if len(deltas) != self.revision - revision:
+                deltas = None
+            return self.revision, self.df, deltas
+
+    def filter(self, nome=None, semestre=None, turma=None, escolha=None):
+        """Aplica os filtros da aba de inscrições e retorna o recorte e a duração em segundos."""
+        start = time.perf_counter()
+        df = self.df
+        mask = np.ones(len(df), dtype=bool)
+        if nome and 'nome' in df:
+            needle = unidecode(nome).strip()
+            mask &= df['nome'].str.contains(needle, case=False, regex=False).fillna(False).to_numpy(bool)
+        for column, value in (('semestre', semestre), ('turma', turma), ('escolha', escolha)):
+            if value and column in df:
+                mask &= (df[column] == value).to_numpy(bool)
+        result = df[mask]
+        seconds = time.perf_counter() - start
+        metrics.observe('local_filter', seconds)
+        return result, seconds
+
+
+@st.cache_resource(max_entries=4, ttl=600, show_spinner='Carregando inscrições do semestre...')
+def load_enrollments(semester, user, generation, _fetch):
+    """
+    Carrega as inscrições de `semester` (ou de todos, com `None`) para filtragem
+    local. Cada administrador (`user`) tem o seu conjunto, buscado com as
+    credenciais dele. `generation` é a do cache de consultas: uma escrita na API
+    gera uma nova chave e o conjunto é recarregado.
+    """
+    data = _fetch()
+    if data is None:
+        # Exceções não ficam no cache: a próxima execução tenta de novo
+        raise DatasetUnavailable(semester)
+    return EnrollmentDataset(data.get('data', []), data.get('sync_cursor'))
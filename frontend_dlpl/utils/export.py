@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+from collections import namedtuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+from utils.dataset import compact_dtypes
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+MAX_COLUMN_WIDTH = 60
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+INVALID_SHEET_CHARS = set('[]:*?/\\')
+# Linhas gravadas entre duas atualizações do progresso (e verificações de cancelamento)
+REPORT_EVERY = 2000
+PARQUET_ROW_GROUP = 50000
+
+
+# --- FUNÇÕES HELPER ---
+def data_version(df):
+    """Calcula um hash do conteúdo do DataFrame, usado como versão dos dados exportados."""
+    digest = hashlib.sha1(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def column_widths(df):
+    """Estima a largura de cada coluna pelo maior texto da coluna ou do cabeçalho."""
+    widths = []
+    for column in df.columns:
+        longest = df[column].astype(str).str.len().max() if len(df) else 0
+        widths.append(min(max(int(longest), len(str(column))), MAX_COLUMN_WIDTH))
+    return widths
+
+
+def _clean_row(row):
+    # xlsxwriter não aceita NaN nem pd.NA; células vazias ficam em branco como no pandas
+    return [
+        None if value is None or value is pd.NA or (isinstance(value, float) and value != value) else value
+        for value in row
+    ]
+
+
+def _sheet_title(name, used):
+    """Nome de aba aceito pelo Excel (até 31 caracteres, sem `[]:*?/\\`) e único na planilha."""
+    title = ''.join(' ' if char in INVALID_SHEET_CHARS else char for char in str(name)).strip()[:31] or 'Sem turma'
+    candidate, suffix = title, 2
+    while candidate.lower() in used:
+        candidate = f'{title[:31 - len(str(suffix)) - 1]}~{suffix}'
+        suffix += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _write_sheet(worksheet, df, header_format, report, offset=0):
+    for col_idx, width in enumerate(column_widths(df)):
+        worksheet.set_column(col_idx, col_idx, width)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+    for row_idx, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row_idx, 0, _clean_row(row))
+        if report and row_idx % REPORT_EVERY == 0:
+            report(offset + row_idx)
+
+
+def write_xlsx(df, target, report=None, sheet_name='enrollments'):
+    """
+    Grava o .xlsx do DataFrame em `target` (caminho ou arquivo) no modo
+    `constant_memory` do xlsxwriter, que grava cada linha em disco assim que
+    ela é escrita. `report(linhas)` é chamado a cada `REPORT_EVERY` linhas e
+    pode interromper a geração levantando uma exceção.
+    """
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    header_format = workbook.add_format(HEADER_FORMAT)
+    _write_sheet(workbook.add_worksheet(sheet_name), df, header_format, report)
+    workbook.close()
+
+
+def write_xlsx_by_turma(df, target, report=None):
+    """Como `write_xlsx`, mas com uma aba por turma (as inscrições sem turma ficam em "Sem turma")."""
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    header_format = workbook.add_format(HEADER_FORMAT)
+    if 'turma' in df and len(df):
+        groups = df.groupby(df['turma'].astype(object).fillna('Sem turma').astype(str), sort=True)
+    else:
+        groups = [('enrollments', df)]
+    used, written = set(), 0
+    for turma, group in groups:
+        worksheet = workbook.add_worksheet(_sheet_title(turma, used))
+        _write_sheet(worksheet, group, header_format, report, offset=written)
+        written += len(group)
+    workbook.close()
+
+
+def write_csv_gz(df, target, report=None):
+    """Grava o CSV compactado com gzip em blocos de `REPORT_EVERY` linhas, em UTF-8 com BOM para o Excel."""
+    with gzip.open(target, 'wt', encoding='utf-8-sig', newline='') as f:
+        df.iloc[:0].to_csv(f, index=False)
+        for start in range(0, len(df), REPORT_EVERY):
+            df.iloc[start:start + REPORT_EVERY].to_csv(f, index=False, header=False)
+            if report:
+                report(min(start + REPORT_EVERY, len(df)))
+
+
+def write_parquet(df, target, report=None):
+    """
+    Grava o Parquet com o `pyarrow`, um grupo de linhas por bloco. Colunas
+    `category` viram colunas com dicionário, sem repetir cada texto. As colunas
+    `object` viram texto antes (como no modo local), pois o Arrow recusa colunas
+    com tipos misturados, como `nota_predita` com notas e o `'N/A'` padrão.
+    """
+    table = pa.Table.from_pandas(compact_dtypes(df.copy(deep=False)), preserve_index=False)
+    with pq.ParquetWriter(target, table.schema, compression='zstd') as writer:
+        for start in range(0, max(table.num_rows, 1), PARQUET_ROW_GROUP):
+            writer.write_table(table.slice(start, PARQUET_ROW_GROUP))
+            if report:
+                report(min(start + PARQUET_ROW_GROUP, table.num_rows))
+
+
+ExportFormat = namedtuple('ExportFormat', ['label', 'extension', 'mime', 'writer'])
+
+# Formatos oferecidos na aba de inscrições: chave -> formato
+FORMATS = {
+    'xlsx': ExportFormat('Excel (.xlsx)', 'xlsx', XLSX_MIME, write_xlsx),
+    'xlsx_turmas': ExportFormat('Excel, uma aba por turma (.xlsx)', 'xlsx', XLSX_MIME, write_xlsx_by_turma),
+    'csv_gz': ExportFormat('CSV compactado (.csv.gz)', 'csv.gz', 'application/gzip', write_csv_gz),
+    'parquet': ExportFormat('Parquet (.parquet)', 'parquet', 'application/vnd.apache.parquet', write_parquet),
+}
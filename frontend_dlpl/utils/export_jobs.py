@@ -0,0 +1,275 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+from pathlib import Path
+
+from utils import metrics
+from utils.export import FORMATS, data_version
+
+# Pool próprio e pequeno: exportações grandes não ocupam as threads das chamadas à API
+EXPORT_WORKERS = int(getenv('EXPORT_WORKERS', '2'))
+# Os arquivos têm nomes e CPFs: sem EXPORT_STORE_DIR, cada processo usa um diretório temporário privado
+EXPORT_STORE_DIR = getenv('EXPORT_STORE_DIR')
+EXPORT_STORE_MAX_BYTES = int(getenv('EXPORT_STORE_MAX_BYTES', str(256 * 1024 * 1024)))
+EXPORT_STORE_MAX_FILES = int(getenv('EXPORT_STORE_MAX_FILES', '32'))
+EXPORT_STORE_TTL = float(getenv('EXPORT_STORE_TTL', '900'))
+# Tarefas concluídas lembradas pelo processo (as mais antigas são esquecidas)
+EXPORT_JOB_HISTORY = int(getenv('EXPORT_JOB_HISTORY', '64'))
+
+logger = logging.getLogger(__name__)
+
+
+class ExportCancelled(Exception):
+    """A tarefa foi cancelada; levantada pelo `report` no meio da gravação."""
+
+
+class ArtifactStore:
+    """
+    Diretório temporário com os arquivos exportados, nomeados pelo hash da
+    chave (formato, filtros e versão dos dados) para serem reaproveitados por
+    qualquer sessão. Um arquivo vence `ttl` segundos depois de gravado, mesmo
+    que continue sendo pedido; os vencidos saem primeiro e depois os mais
+    antigos, até respeitar os limites de quantidade e de bytes.
+    """
+
+    def __init__(self, directory=EXPORT_STORE_DIR, max_bytes=EXPORT_STORE_MAX_BYTES,
+                 max_files=EXPORT_STORE_MAX_FILES, ttl=EXPORT_STORE_TTL):
+        # `mkdtemp` cria o diretório acessível só pelo usuário do processo
+        self.directory = Path(directory) if directory else Path(tempfile.mkdtemp(prefix='dlpl-exports-'))
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counters = {'stored': 0, 'reused': 0, 'evicted': 0}
+
+    def path_for(self, key, extension):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return self.directory / f'{digest}.{extension}'
+
+    def get(self, key, extension):
+        """Caminho do arquivo já gerado para `key`, ou `None` se não existe ou venceu."""
+        path = self.path_for(key, extension)
+        try:
+            # O mtime é o da gravação: reaproveitar o arquivo não adia o vencimento
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+        except OSError:
+            return None
+        with self._lock:
+            self._counters['reused'] += 1
+        return path
+
+    def write(self, key, extension, writer):
+        """
+        Grava o arquivo de `key` com `writer(caminho)` em um nome temporário e o
+        move para o nome final só no fim, para que ninguém baixe um arquivo pela
+        metade. Se `writer` falhar (ou a tarefa for cancelada), nada fica no disco.
+        """
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path = self.path_for(key, extension)
+        partial = path.with_name(f'{path.name}.{uuid.uuid4().hex[:8]}.part')
+        try:
+            writer(partial)
+            os.replace(partial, path)
+        finally:
+            partial.unlink(missing_ok=True)
+        with self._lock:
+            self._counters['stored'] += 1
+        self.evict(keep=path)
+        return path
+
+    def _artifacts(self):
+        files = []
+        for path in self.directory.glob('*'):
+            if path.suffix == '.part':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return sorted(files)
+
+    def evict(self, keep=None):
+        now = time.time()
+        with self._lock:
+            files = self._artifacts()
+            total = sum(size for _, size, _ in files)
+            for index, (mtime, size, path) in enumerate(files):
+                remaining = len(files) - index
+                expired = now - mtime > self.ttl
+                if path == keep or not (expired or remaining > self.max_files or total > self.max_bytes):
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
+                self._counters['evicted'] += 1
+
+    def stats(self):
+        with self._lock:
+            files = self._artifacts() if self.directory.exists() else []
+            return {
+                **self._counters,
+                'files': len(files),
+                'bytes': sum(size for _, size, _ in files),
+                'max_files': self.max_files,
+                'max_bytes': self.max_bytes,
+                'path': str(self.directory),
+            }
+
+
+class ExportJob:
+    """Uma exportação em segundo plano: estado, progresso e pedido de cancelamento."""
+
+    def __init__(self, format_key, key):
+        self.id = uuid.uuid4().hex[:12]
+        self.format = format_key
+        self.key = key
+        self.state = 'queued'
+        self.rows_done = 0
+        self.rows_total = None
+        self.version = None
+        self.path = None
+        self.size = 0
+        self.error = None
+        self.reused = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    @property
+    def progress(self):
+        if self.state == 'done':
+            return 1.0
+        if not self.rows_total:
+            return 0.0
+        return min(self.rows_done / self.rows_total, 1.0)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise ExportCancelled(self.id)
+
+    def report(self, rows_done):
+        """Atualiza o progresso; chamado pelos geradores de `export`, que param se houver cancelamento."""
+        self.rows_done = rows_done
+        self.check()
+
+    def describe(self):
+        if self.state == 'queued':
+            return 'Na fila...'
+        if self.rows_total is None:
+            return 'Buscando as inscrições...'
+        return f'Gravando {self.rows_done:,} de {self.rows_total:,} linhas'.replace(',', '.')
+
+
+class ExportJobs:
+    """
+    Fila de exportações do processo. Pedidos iguais (formato e filtros)
+    reaproveitam a tarefa ainda em andamento; o arquivo já gerado é
+    reaproveitado se a versão dos dados for a mesma.
+    """
+
+    def __init__(self, store, max_workers=EXPORT_WORKERS, history=EXPORT_JOB_HISTORY):
+        self.store = store
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dlpl-export')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, format_key, key, load, user, version=None):
+        """
+        Agenda a exportação de `load()` (função sem argumentos que retorna o
+        DataFrame) no formato `format_key`; `load` roda no pool de exportação.
+        Tarefas e arquivos ficam separados por usuário autenticado (`user`): o
+        que foi buscado com as credenciais de um administrador não é entregue a
+        outro. Sem `version` (dados ainda não buscados), a versão é o hash do
+        DataFrame carregado pela tarefa, e um arquivo igual já gravado só é
+        reaproveitado depois da busca. Retorna a `ExportJob`.
+        """
+        full_key = (user, format_key, key)
+        extension = FORMATS[format_key].extension
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == full_key and not job.finished and version in (None, job.version):
+                    metrics.increment('export_job', result='coalesced', format=format_key)
+                    return job
+            job = ExportJob(format_key, full_key)
+            job.version = version
+            path = self.store.get((*full_key, version), extension) if version is not None else None
+            if path is not None:
+                self._reuse(job, path)
+            self._jobs[job.id] = job
+            self._forget_old()
+        if job.reused:
+            metrics.increment('export_job', result='reused', format=format_key)
+        else:
+            self._executor.submit(self._run, job, load)
+        return job
+
+    @staticmethod
+    def _reuse(job, path):
+        job.state, job.reused, job.path = 'done', True, path
+        job.size = path.stat().st_size
+        job.finished_at = time.time()
+
+    def _forget_old(self):
+        finished = sorted((job.created_at, job_id) for job_id, job in self._jobs.items() if job.finished)
+        for _, job_id in finished[:max(len(self._jobs) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, load):
+        export_format = FORMATS[job.format]
+        start = time.perf_counter()
+        try:
+            job.check()
+            job.state = 'running'
+            df = load()
+            job.rows_total = len(df)
+            job.check()
+            if job.version is None:
+                job.version = data_version(df)
+                path = self.store.get((*job.key, job.version), export_format.extension)
+                if path is not None:
+                    self._reuse(job, path)
+                    return
+            job.path = self.store.write(
+                (*job.key, job.version),
+                export_format.extension,
+                lambda target: export_format.writer(df, target, report=job.report),
+            )
+            job.size = job.path.stat().st_size
+            job.state = 'done'
+            metrics.observe('export_build', time.perf_counter() - start, format=job.format)
+        except ExportCancelled:
+            job.state = 'cancelled'
+        except Exception as e:
+            logger.exception('Falha na exportação %s', job.id)
+            job.error = str(e) or e.__class__.__name__
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            metrics.increment('export_job', result='reused' if job.reused else job.state, format=job.format)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {state: states.count(state) for state in ('queued', 'running', 'done', 'failed', 'cancelled')}
+
+
+export_jobs = ExportJobs(ArtifactStore())
@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from os import getenv
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.structures import CaseInsensitiveDict
+
+load_dotenv()
+# Caminho do arquivo SQLite; vazio desativa o cache. Guarda respostas de /users/ e /config/, então o
+# arquivo é criado só com permissão para o dono
+HTTP_CACHE_PATH = getenv('HTTP_CACHE_PATH', str(Path(__file__).resolve().parents[2] / '.cache' / 'http_cache.sqlite3'))
+HTTP_CACHE_MAX_ENTRIES = int(getenv('HTTP_CACHE_MAX_ENTRIES', '500'))
+HTTP_CACHE_MAX_BODY = int(getenv('HTTP_CACHE_MAX_BODY', str(2 * 1024 * 1024)))
+
+# Endpoints com respostas guardadas em disco: dados que mudam pouco e sem dados pessoais de alunos
+HTTP_CACHE_ENDPOINTS = tuple(
+    prefix.strip() for prefix in getenv('HTTP_CACHE_ENDPOINTS', '/turma/,/config/,/users/').split(',') if prefix.strip()
+)
+
+# Endpoints cuja última resposta boa é servida sem a API quando ela falha ou o circuito está aberto:
+# turmas e semestres, que a página pública já mostra a qualquer aluno. `/users/` e `/config/` ficam de fora,
+# pois seriam entregues sem a API autorizar a chamada
+HTTP_FALLBACK_ENDPOINTS = tuple(
+    prefix.strip() for prefix in getenv('HTTP_FALLBACK_ENDPOINTS', '/turma/').split(',') if prefix.strip()
+)
+
+# Cabeçalhos da resposta guardados junto com o corpo
+STORED_HEADERS = ('Content-Type', 'Content-Encoding', 'ETag', 'Last-Modified', 'Cache-Control')
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+'''
+
+
+def cacheable(url):
+    path = urlsplit(url).path
+    return any(path.startswith(prefix) for prefix in HTTP_CACHE_ENDPOINTS)
+
+
+def fallback_allowed(url):
+    path = urlsplit(url).path
+    return any(path.startswith(prefix) for prefix in HTTP_FALLBACK_ENDPOINTS)
+
+
+def request_key(method, url, params=None):
+    """Chave do cache: método e URL completa, com os parâmetros já codificados."""
+    return f'{method.upper()} {requests.Request(method, url, params=params).prepare().url}'
+
+
+class ResponseCache:
+    """
+    Cache em disco (SQLite) de respostas GET com `ETag` ou `Last-Modified`.
+
+    Com a API no ar, as respostas guardadas nunca são servidas sem consultá-la:
+    o cliente envia `If-None-Match`/`If-Modified-Since` e só reaproveita o
+    corpo quando a API responde 304. Assim a API continua autorizando cada
+    chamada e o arquivo pode ser compartilhado entre sessões, reinícios e
+    réplicas.
+
+    A exceção é `fallback`: com o endpoint fora do ar ou o circuito aberto, a
+    última resposta boa é servida sem a API, mas só para os endpoints de
+    `HTTP_FALLBACK_ENDPOINTS`, que não exigem essa autorização. Para eles a
+    resposta é guardada mesmo sem validadores.
+    O total de entradas é limitado; as menos usadas saem primeiro.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, max_entries=HTTP_CACHE_MAX_ENTRIES, max_body=HTTP_CACHE_MAX_BODY):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self._connection = None
+        self._disabled = not path
+        self._lock = threading.Lock()
+        self._counters = {'revalidated': 0, 'fallbacks': 0, 'stored': 0, 'evicted': 0, 'skipped': 0}
+
+    def _connect(self):
+        if self._connection is None and not self._disabled:
+            try:
+                Path(self.path).parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+                Path(self.path).touch(mode=0o600)
+                os.chmod(self.path, 0o600)
+                connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+                # WAL permite que réplicas no mesmo disco leiam enquanto outra grava
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(SCHEMA)
+                self._connection = connection
+            except (OSError, sqlite3.Error) as e:
+                self._disabled = True
+                logger.warning('Cache HTTP em disco desativado (%s): %s', self.path, e)
+        return self._connection
+
+    def lookup(self, key):
+        """Validadores (`etag`, `last_modified`) da resposta guardada em `key`, ou `None`."""
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute(
+                    'SELECT etag, last_modified FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                # Um problema no arquivo (ex.: bloqueado por outra réplica) só faz a chamada ir sem cache
+                logger.warning('Falha ao ler o cache HTTP: %s', e)
+                return None
+        return {'etag': row[0], 'last_modified': row[1]} if row else None
+
+    def conditional_headers(self, key):
+        """Cabeçalhos de revalidação para a resposta guardada em `key` (vazio se não houver)."""
+        entry = self.lookup(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _load(self, key):
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute('SELECT headers, body FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    return None
+                connection.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+                connection.commit()
+            except sqlite3.Error as e:
+                logger.warning('Falha ao ler o cache HTTP: %s', e)
+                return None
+            return row
+
+    @staticmethod
+    def _response(row, url):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(json.loads(row[0]))
+        response._content = bytes(row[1])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = url
+        response.from_cache = True
+        return response
+
+    def restore(self, key, not_modified):
+        """
+        Monta a resposta 200 guardada em `key` para um 304 recebido da API.
+        Retorna `None` se a entrada sumiu nesse meio-tempo.
+        """
+        row = self._load(key)
+        if row is None:
+            return None
+        with self._lock:
+            self._counters['revalidated'] += 1
+        response = self._response(row, not_modified.url)
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        return response
+
+    def fallback(self, key, url):
+        """
+        Última resposta boa guardada em `key`, servida sem consultar a API quando
+        o endpoint está fora do ar ou com o circuito aberto. Só vale para
+        `HTTP_FALLBACK_ENDPOINTS`; para os demais retorna `None`. A resposta vem
+        com `stale = True`, para quem quiser avisar que os dados podem estar desatualizados.
+        """
+        if not fallback_allowed(url):
+            return None
+        row = self._load(key)
+        if row is None:
+            return None
+        with self._lock:
+            self._counters['fallbacks'] += 1
+        response = self._response(row, url)
+        response.stale = True
+        return response
+
+    def store(self, key, response):
+        """
+        Guarda uma resposta 200 que tenha validadores (ou, sem eles, de um
+        endpoint de `HTTP_FALLBACK_ENDPOINTS`, só para o `fallback`),
+        respeitando `no-store` e o tamanho máximo.
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified or fallback_allowed(response.url)):
+            return
+        if 'no-store' in response.headers.get('Cache-Control', '') or len(response.content) > self.max_body:
+            self._counters['skipped'] += 1
+            return
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                connection.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key, etag, last_modified, json.dumps(headers), response.content, now, now),
+                )
+                evicted = connection.execute(
+                    'DELETE FROM responses WHERE key IN '
+                    '(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,),
+                ).rowcount
+                connection.commit()
+            except sqlite3.Error as e:
+                connection.rollback()
+                logger.warning('Falha ao gravar no cache HTTP: %s', e)
+                return
+            self._counters['stored'] += 1
+            self._counters['evicted'] += max(evicted, 0)
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                connection.execute('DELETE FROM responses')
+                connection.commit()
+            except sqlite3.Error as e:
+                connection.rollback()
+                logger.warning('Falha ao limpar o cache HTTP: %s', e)
+
+    def stats(self):
+        with self._lock:
+            connection = self._connect()
+            entries, size = (0, 0)
+            if connection is not None:
+                try:
+                    entries, size = connection.execute(
+                        'SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses'
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning('Falha ao ler o cache HTTP: %s', e)
+            return {
+                **self._counters,
+                'entries': entries,
+                'bytes': size,
+                'max_entries': self.max_entries,
+                'path': self.path if not self._disabled else 'desativado',
+            }
+
+
+response_cache = ResponseCache()
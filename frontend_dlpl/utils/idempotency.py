@@ -0,0 +1,109 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, wait
+from os import getenv
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from utils import metrics
+from utils.validation import normalize_cpf
+
+load_dotenv()
+# Por quanto tempo um envio concluído responde às repetições sem ir à API (segundos)
+SUBMISSION_RECORD_TTL = float(getenv('SUBMISSION_RECORD_TTL', '600'))
+SUBMISSION_RECORD_SIZE = int(getenv('SUBMISSION_RECORD_SIZE', '10000'))
+
+
+class SubmissionInterrupted(Exception):
+    """O envio que estava em andamento foi interrompido antes de chegar à API; quem esperava tenta de novo."""
+
+
+def submission_key(cpf, course, turma, semester):
+    """
+    Chave de idempotência de uma inscrição: hash do CPF (só dígitos), curso,
+    turma e semestre. O hash evita guardar o CPF em claro nos registros.
+    """
+    fields = [normalize_cpf(cpf), str(course), str(turma), str(semester)]
+    return hashlib.sha256('|'.join(fields).encode()).hexdigest()
+
+
+def payload_digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def is_definitive(response):
+    """Respostas que não mudam se o mesmo envio for repetido: sucesso ou recusa (4xx, exceto 408 e 429)."""
+    return response.status_code < 500 and response.status_code not in (408, 429)
+
+
+class SubmissionGuard:
+    """
+    Evita envios duplicados de inscrições no processo.
+
+    - Um segundo envio com a mesma chave enquanto o primeiro está em andamento
+      espera e recebe a mesma resposta, sem uma nova chamada à API.
+    - Envios concluídos com resposta definitiva ficam registrados por `ttl`
+      segundos; repetições com os mesmos dados são respondidas localmente.
+    - Se a mesma chave chega com dados diferentes (ex.: outra escolha), o envio
+      é feito normalmente, depois do que estiver em andamento.
+    """
+
+    def __init__(self, ttl=SUBMISSION_RECORD_TTL, maxsize=SUBMISSION_RECORD_SIZE):
+        self._completed = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._counters = {'sent': 0, 'attached': 0, 'replayed': 0, 'changed': 0}
+
+    def submit(self, key, payload, send):
+        """Envia com `send()` (que retorna o `requests.Response`) a menos que já haja envio igual pendente ou concluído."""
+        digest = payload_digest(payload)
+        while True:
+            with self._lock:
+                record = self._completed.get(key)
+                if record is not None and record[0] == digest:
+                    self._counters['replayed'] += 1
+                    metrics.increment('submission_duplicate', result='replayed')
+                    return record[1]
+                pending = self._inflight.get(key)
+                if pending is None:
+                    if record is not None:
+                        self._counters['changed'] += 1
+                    future = Future()
+                    self._inflight[key] = (digest, future)
+                    self._counters['sent'] += 1
+                    break
+            pending_digest, pending_future = pending
+            if pending_digest != digest:
+                # Dados diferentes: espera o envio em andamento terminar e envia os novos
+                wait([pending_future])
+                continue
+            with self._lock:
+                self._counters['attached'] += 1
+            metrics.increment('submission_duplicate', result='attached')
+            try:
+                return pending_future.result()
+            except SubmissionInterrupted:
+                continue
+
+        try:
+            response = send()
+        except BaseException as e:
+            # Inclui a interrupção do script pelo Streamlit; quem esperava não deve recebê-la
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e if isinstance(e, Exception) else SubmissionInterrupted(key))
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if is_definitive(response):
+                self._completed[key] = (digest, response)
+        future.set_result(response)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'in_flight': len(self._inflight), 'recorded': len(self._completed)}
+
+
+submission_guard = SubmissionGuard()
@@ -0,0 +1,282 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import getenv
+
+# Limites superiores, em segundos, dos buckets dos histogramas
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = 'dlpl'
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_scope = threading.local()
+_exporter = None
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """
+    Histograma de durações com buckets fixos: registrar custa uma busca binária
+    e alguns incrementos, e a memória não cresce com o número de observações.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max', 'last')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.last = other.last
+
+    def quantile(self, q):
+        """Estima o quantil `q` interpolando linearmente dentro do bucket em que ele cai."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                value = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return min(value, self.max)
+            cumulative += bucket_count
+        return self.max
+
+
+# --- REGISTRO ---
+def observe(name, seconds, **labels):
+    """Registra uma duração na série `name` com os rótulos dados (ex.: endpoint, status)."""
+    key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def increment(name, amount=1, **labels):
+    """Soma `amount` ao contador `name` com os rótulos dados (ex.: requisições evitadas)."""
+    key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    """Define o valor atual do medidor `name` (ex.: tamanho de uma fila), que sobe e desce."""
+    key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+    with _lock:
+        _gauges[key] = value
+
+
+@contextmanager
+def timer(name, **labels):
+    """Mede o bloco `with` e registra a duração, mesmo se ele terminar com exceção."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def cache_scope(cache):
+    """
+    Marca as chamadas à API feitas dentro do bloco como falhas do cache `cache`,
+    para que o `api_client` as registre com `cache='miss'`.
+    """
+    previous = getattr(_scope, 'cache', None)
+    _scope.cache = cache
+    try:
+        yield
+    finally:
+        _scope.cache = previous
+
+
+def current_cache():
+    """Nome do cache cuja falha originou a chamada em andamento nesta thread, ou `None`."""
+    return getattr(_scope, 'cache', None)
+
+
+def record_timing(name, seconds):
+    """Registra a duração de uma execução de `name` (ex.: um fragmento da página)."""
+    observe('fragment', seconds, fragment=name)
+
+
+# --- CONSULTA ---
+def histograms(name=None, by=None):
+    """
+    Resumo das séries registradas, em milissegundos, uma linha por série e
+    combinação de rótulos. Com `name`, só as séries com esse nome; com `by`,
+    as séries são agregadas mantendo apenas os rótulos listados.
+    """
+    with _lock:
+        merged = {}
+        for (series, labels), histogram in _histograms.items():
+            if name is not None and series != name:
+                continue
+            if by is not None:
+                labels = tuple((label, value) for label, value in labels if label in by)
+            target = merged.get((series, labels))
+            if target is None:
+                target = merged[(series, labels)] = Histogram()
+            target.merge(histogram)
+
+    rows = []
+    for (series, labels), histogram in merged.items():
+        rows.append(
+            {
+                **({} if name else {'metric': series}),
+                **dict(labels),
+                'count': histogram.count,
+                'avg_ms': round(1000 * histogram.total / histogram.count, 1),
+                'p50_ms': round(1000 * histogram.quantile(0.5), 1),
+                'p95_ms': round(1000 * histogram.quantile(0.95), 1),
+                'p99_ms': round(1000 * histogram.quantile(0.99), 1),
+                'max_ms': round(1000 * histogram.max, 1),
+                'last_ms': round(1000 * histogram.last, 1),
+            }
+        )
+    return sorted(rows, key=lambda row: row['count'], reverse=True)
+
+
+def counters(name=None):
+    """Valores dos contadores, uma linha por contador e combinação de rótulos."""
+    with _lock:
+        snapshot = [(key, value) for key, value in _counters.items() if name is None or key[0] == name]
+    rows = [
+        {**({} if name else {'metric': series}), **dict(labels), 'count': value}
+        for (series, labels), value in snapshot
+    ]
+    return sorted(rows, key=lambda row: row['count'], reverse=True)
+
+
+def gauges(name=None):
+    """Valores atuais dos medidores, uma linha por medidor e combinação de rótulos."""
+    with _lock:
+        snapshot = [(key, value) for key, value in _gauges.items() if name is None or key[0] == name]
+    return [{**({} if name else {'metric': series}), **dict(labels), 'value': value} for (series, labels), value in snapshot]
+
+
+def timings():
+    """Resumo das durações dos fragmentos, uma linha por fragmento."""
+    return histograms('fragment')
+
+
+def reset():
+    # Os medidores refletem o estado atual (ex.: filas) e não são zerados
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+# --- EXPORTAÇÃO ---
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (
+        (label, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for label, value in pairs
+    )
+    return '{' + ','.join(f'{label}="{value}"' for label, value in escaped) + '}'
+
+
+def prometheus_text():
+    """
+    Exporta todas as séries no formato texto do Prometheus: durações como
+    histogramas em segundos, contadores com o sufixo `_total` e medidores como `gauge`.
+    """
+    with _lock:
+        snapshot = sorted(
+            (key, list(histogram.counts), histogram.count, histogram.total)
+            for key, histogram in _histograms.items()
+        )
+        counter_snapshot = sorted(_counters.items())
+        gauge_snapshot = sorted(_gauges.items())
+    lines = []
+    current = None
+    for (series, labels), value in counter_snapshot:
+        metric = f'{METRIC_PREFIX}_{series}_total'
+        if metric != current:
+            current = metric
+            lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric}{_format_labels(labels)} {value}')
+    for (series, labels), value in gauge_snapshot:
+        metric = f'{METRIC_PREFIX}_{series}'
+        if metric != current:
+            current = metric
+            lines.append(f'# TYPE {metric} gauge')
+        lines.append(f'{metric}{_format_labels(labels)} {value}')
+    for (series, labels), counts, count, total in snapshot:
+        metric = f'{METRIC_PREFIX}_{series}_seconds'
+        if metric != current:
+            current = metric
+            lines.append(f'# TYPE {metric} histogram')
+        cumulative = 0
+        for bound, bucket_count in zip((*BUCKETS, '+Inf'), counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{_format_labels(labels, [("le", str(bound))])} {cumulative}')
+        lines.append(f'{metric}_sum{_format_labels(labels)} {total:.6f}')
+        lines.append(f'{metric}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class _ExporterHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        payload = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_exporter():
+    """
+    Sobe, uma única vez por processo, o endpoint `/metrics` para o Prometheus na
+    porta `METRICS_PORT`. Sem a variável definida, não faz nada.
+    """
+    global _exporter
+    port = getenv('METRICS_PORT')
+    if not port or _exporter is not None:
+        return
+    with _lock:
+        if _exporter is not None:
+            return
+        try:
+            server = ThreadingHTTPServer((getenv('METRICS_HOST', '0.0.0.0'), int(port)), _ExporterHandler)
+        except OSError as e:
+            # Não tenta de novo a cada rerun; a página segue funcionando sem o endpoint
+            _exporter = False
+            logger.warning('Não foi possível abrir a porta %s para as métricas: %s', port, e)
+            return
+        server.daemon_threads = True
+        _exporter = server
+    threading.Thread(target=server.serve_forever, name='dlpl-metrics', daemon=True).start()
@@ -1,8 +1,11 @@
 import base64
+import time
+from functools import wraps
 from os import getenv
 from pathlib import Path
 
 import streamlit as st
+from utils import metrics
 
 
 # --- FUNÇÕES HELPER ---
@@ -53,3 +56,43 @@ def floating_reload_button():
     """,
         unsafe_allow_html=True,
     )
+
+
+def lazy_tabs(sections, key, keep=()):
+    """
+    Substitui o `st.tabs`, que executa o corpo de todas as abas a cada rerun,
+    por um seletor de seções: só a função da seção ativa é executada, então as
+    demais não fazem chamadas à API nem montam DataFrames.
+
+    `sections` mapeia o rótulo de cada seção para a função que a desenha.
+    Widgets de seções inativas não são desenhados e o Streamlit descarta seu
+    estado; as chaves listadas em `keep` são preservadas entre as trocas de seção.
+    """
+    for widget_key in keep:
+        if widget_key in st.session_state:
+            st.session_state[widget_key] = st.session_state[widget_key]
+
+    active = st.radio('Seção', list(sections), horizontal=True, key=key, label_visibility='collapsed')
+    sections[active]()
+    return active
+
+
+def timed_fragment(name):
+    """
+    Transforma a função em um `st.fragment`: interações com seus widgets reexecutam
+    só a função, não a página inteira. A duração de cada execução é registrada em
+    `metrics` com o nome `name`.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record_timing(name, time.perf_counter() - start)
+
+        return st.fragment(timed)
+
+    return decorator
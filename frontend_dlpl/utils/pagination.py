@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+
+from cachetools import TTLCache
+
+PREFETCH_WORKERS = int(getenv('PREFETCH_WORKERS', '4'))
+PAGE_CACHE_SIZE = int(getenv('PAGE_CACHE_SIZE', '20'))
+PAGE_CACHE_TTL = float(getenv('PAGE_CACHE_TTL', '120'))
+
+# Pool compartilhado pelo processo para buscar a próxima página em segundo plano
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='dlpl-prefetch')
+
+
+class Page:
+    """Uma página de resultados retornada pela API."""
+
+    def __init__(self, rows, number, total=None, has_next=False, paged=True):
+        self.rows = rows
+        self.number = number
+        self.total = total
+        self.has_next = has_next
+        # False quando o backend ignorou a paginação e retornou a lista completa
+        self.paged = paged
+
+
+class PagedQuery:
+    """
+    Busca uma listagem da API página a página.
+
+    `fetch(offset=..., limit=..., cursor=...)` deve retornar o JSON da resposta.
+    Se a resposta trouxer `total`, `has_more` ou `next_cursor`, o backend suporta
+    paginação: as páginas vistas ficam em um LRU limitado (com TTL) e a próxima
+    página é buscada em segundo plano. Caso contrário a resposta é tratada como a
+    lista completa, como na busca sem paginação.
+
+    `fetch` roda fora da thread do script quando usado no prefetch, portanto não
+    pode acessar `st.session_state` nem chamar elementos do Streamlit.
+    """
+
+    def __init__(self, page_size=100, max_pages=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL):
+        self.page_size = page_size
+        self._pages = TTLCache(maxsize=max_pages, ttl=ttl)
+        self._cursors = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._cursors.clear()
+
+    def _load(self, fetch, query, number):
+        cursor = self._cursors.get((query, number))
+        response = fetch(offset=number * self.page_size, limit=self.page_size, cursor=cursor)
+        rows = response.get('data', [])
+
+        if not any(key in response for key in ('total', 'has_more', 'next_cursor')):
+            return Page(rows, 0, total=len(rows), paged=False)
+
+        total = response.get('total')
+        next_cursor = response.get('next_cursor')
+        if 'has_more' in response:
+            has_next = bool(response['has_more'])
+        elif 'next_cursor' in response:
+            has_next = next_cursor is not None
+        else:
+            has_next = (number + 1) * self.page_size < (total or 0)
+
+        with self._lock:
+            if next_cursor is not None:
+                self._cursors[(query, number + 1)] = next_cursor
+        return Page(rows, number, total=total, has_next=has_next)
+
+    def _load_and_store(self, fetch, query, number):
+        key = (query, number)
+        try:
+            page = self._load(fetch, query, number)
+            with self._lock:
+                self._pages[key] = page
+            return page
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _submit(self, fetch, query, number):
+        key = (query, number)
+        with self._lock:
+            if key in self._pages:
+                return None
+            future = self._inflight.get(key)
+            if future is None:
+                future = _executor.submit(self._load_and_store, fetch, query, number)
+                self._inflight[key] = future
+            return future
+
+    def get_page(self, fetch, query, number):
+        """
+        Retorna a página `number` da consulta `query` (uma chave hashable com os
+        filtros e a ordenação), reaproveitando páginas em cache ou já em voo.
+        """
+        key = (query, number)
+        with self._lock:
+            page = self._pages.get(key)
+            future = self._inflight.get(key)
+        if page is None:
+            page = future.result() if future else self._load_and_store(fetch, query, number)
+
+        if page.paged and page.has_next:
+            self._submit(fetch, query, number + 1)
+        return page
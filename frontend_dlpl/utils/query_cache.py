@@ -0,0 +1,285 @@
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import wait
+from datetime import datetime
+from functools import partial
+from os import getenv
+
+from cachetools import TTLCache
+from utils import concurrency, metrics
+from utils.cache_backend import cache_store
+
+QUERY_CACHE_SIZE = int(getenv('QUERY_CACHE_SIZE', '64'))
+QUERY_CACHE_TTL = float(getenv('QUERY_CACHE_TTL', '60'))
+# Semestres e turmas do painel: após o TTL, a nova busca é condicional e custa só um 304 se nada mudou
+LISTS_CACHE_TTL = float(getenv('LISTS_CACHE_TTL', '60'))
+# Recarrega em segundo plano, logo após uma escrita, os loaders invalidados por ela
+CACHE_EAGER_REFRESH = getenv('CACHE_EAGER_REFRESH', '1') == '1'
+# Invalidações recentes mostradas no painel de desempenho
+INVALIDATION_LOG_SIZE = 20
+# Tags afetadas pelas escritas (POST/PUT/DELETE) em cada prefixo de endpoint
+WRITE_TAGS = (
+    ('/enrollment/', ('enrollments',)),
+    ('/turma/', ('turmas', 'semesters')),
+    ('/config/', ('config',)),
+    ('/users/', ('users',)),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_params(params):
+    """Remove filtros vazios e espaços nas pontas, gerando uma chave estável para o cache."""
+    normalized = {}
+    for key, value in (params or {}).items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            continue
+        normalized[key] = value
+    return tuple(sorted(normalized.items()))
+
+
+class QueryCache:
+    """
+    Cache do processo para respostas de consultas GET, com TTL, limite de
+    tamanho (o item menos usado sai primeiro) e contadores de acertos. As
+    respostas trazem dados pessoais e a API decide o que cada um vê, então
+    ficam separadas por usuário autenticado (`user`): uma sessão nunca recebe
+    o que foi buscado com as credenciais de outro administrador.
+
+    Respostas `None` (erro na API) não são guardadas. `generation` aumenta a cada
+    invalidação, para que caches derivados (ex.: páginas) possam incluí-la na chave.
+
+    Com `shared` (um namespace do `cache_store`), as respostas continuam na
+    memória da réplica, mas as invalidações passam pelo backend: uma escrita
+    feita em outra réplica descarta este cache na próxima consulta.
+    """
+
+    def __init__(self, name, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, shared=None):
+        self.name = name
+        self.shared = shared
+        self._generation = 0
+        self._shared_version = shared.version() if shared else None
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'remote_invalidations': 0}
+
+    @property
+    def generation(self):
+        self._sync()
+        return self._generation
+
+    def _sync(self):
+        """Descarta o cache local se outra réplica invalidou o namespace compartilhado."""
+        if self.shared is None:
+            return
+        version = self.shared.version()
+        with self._lock:
+            if version != self._shared_version:
+                self._shared_version = version
+                self._cache.clear()
+                self._generation += 1
+                self._counters['remote_invalidations'] += 1
+
+    def get_or_fetch(self, user, params, fetch):
+        start = time.perf_counter()
+        key = (user, normalize_params(params))
+        self._sync()
+        with self._lock:
+            if key in self._cache:
+                self._counters['hits'] += 1
+                result = self._cache[key]
+                metrics.observe('cache_lookup', time.perf_counter() - start, cache=self.name, result='hit')
+                return result
+            self._counters['misses'] += 1
+            generation = self._generation
+
+        with metrics.timer('cache_lookup', cache=self.name, result='miss'), metrics.cache_scope(self.name):
+            result = fetch()
+        if result is not None:
+            with self._lock:
+                # Não guarda respostas buscadas antes de uma invalidação concorrente
+                if generation == self._generation:
+                    self._cache[key] = result
+        return result
+
+    def discard(self, user, params):
+        """Descarta só a resposta de `params` para `user` (ex.: atualização manual de uma consulta)."""
+        with self._lock:
+            self._cache.pop((user, normalize_params(params)), None)
+
+    def invalidate(self):
+        """Descarta as respostas em cache e retorna quantas havia nesta réplica."""
+        if self.shared is not None:
+            self.shared.invalidate()
+        with self._lock:
+            evicted = len(self._cache)
+            self._cache.clear()
+            self._generation += 1
+            self._counters['invalidations'] += 1
+            if self.shared is not None:
+                self._shared_version = self.shared.version()
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'size': len(self._cache),
+                'hit_ratio': round(self._counters['hits'] / lookups, 3) if lookups else 0.0,
+            }
+
+
+class TaggedLoader:
+    """
+    Consulta do painel guardada no backend compartilhado (`cache_store`) e
+    marcada com tags: uma escrita invalida só os loaders das tags afetadas
+    (ver `WRITE_TAGS`), sem tocar nos demais caches.
+
+    Com `per_user`, cada usuário autenticado tem as suas entradas (listas que
+    a API só entrega a quem tem permissão, como usuários e configuração); sem,
+    a mesma entrada serve a todos (semestres e turmas).
+
+    Quem lê pode passar em `refresh` uma busca `refresh(session)`; com `eager`,
+    ela é chamada em segundo plano logo após a invalidação, para que a próxima
+    leitura (nesta ou em outra réplica) já encontre o valor novo. Uma leitura
+    que chega durante essa atualização espera por ela em vez de buscar de novo.
+    A sessão fica guardada só por referência fraca: some junto com a sessão do
+    Streamlit, e uma sessão expirada não é usada. Nas entradas por usuário, só
+    as de quem fez a escrita são atualizadas.
+    """
+
+    def __init__(self, name, tags, ttl=LISTS_CACHE_TTL, eager=CACHE_EAGER_REFRESH, per_user=False):
+        self.name = name
+        self.tags = tags
+        self.eager = eager
+        self.per_user = per_user
+        self.namespace = cache_store.namespace(name, ttl)
+        self._refreshers = {}
+        self._refreshing = {}
+        self._lock = threading.Lock()
+        register(self, *tags)
+
+    def get_or_fetch(self, key, fetch, refresh=None, session=None):
+        if self.per_user:
+            key = f'{session.username}:{key}'
+        with self._lock:
+            if refresh is not None and session is not None:
+                self._refreshers[key] = (weakref.ref(session), refresh)
+            pending = self._refreshing.get(key)
+        if pending is not None:
+            wait([pending])
+        return self.namespace.get_or_fetch(key, fetch)
+
+    def invalidate(self):
+        """Invalida o namespace e retorna quantas das chaves já lidas nesta réplica estavam em cache."""
+        with self._lock:
+            keys = list(self._refreshers)
+        evicted = sum(self.namespace.get(key) is not None for key in keys)
+        self.namespace.invalidate()
+        return evicted
+
+    def refresh(self, user=None):
+        """
+        Agenda a atualização das chaves com busca registrada e sessão ainda
+        ativa (nas entradas por usuário, só as de `user`); retorna quantas
+        foram agendadas. As buscas de sessões encerradas são descartadas.
+        """
+        refreshers = []
+        with self._lock:
+            for key, (session_ref, refresh) in list(self._refreshers.items()):
+                session = session_ref()
+                if session is None or session.expired:
+                    del self._refreshers[key]
+                elif not self.per_user or session.username == user:
+                    refreshers.append((key, partial(refresh, session)))
+        for key, refresh in refreshers:
+            future = concurrency.submit(self._refresh, key, refresh)
+            with self._lock:
+                self._refreshing[key] = future
+            future.add_done_callback(partial(self._refresh_done, key))
+        return len(refreshers)
+
+    def _refresh(self, key, refresh):
+        try:
+            with metrics.cache_scope(self.name):
+                value = refresh()
+        except Exception as e:
+            metrics.increment('cache_refresh', loader=self.name, result='error')
+            logger.warning('Falha ao atualizar o cache %s (%s): %s', self.name, key, e)
+            return
+        if value is not None:
+            self.namespace.set(key, value)
+        metrics.increment('cache_refresh', loader=self.name, result='ok')
+
+    def _refresh_done(self, key, future):
+        with self._lock:
+            if self._refreshing.get(key) is future:
+                del self._refreshing[key]
+
+
+# Caches invalidados por tag: (tags, cache). Todo cache registrado tem `name` e `invalidate()`,
+# que retorna quantas entradas descartou
+_tagged = []
+_invalidation_log = deque(maxlen=INVALIDATION_LOG_SIZE)
+
+
+def register(cache, *tags):
+    """Registra um cache para ser invalidado quando uma escrita afetar alguma das `tags`."""
+    _tagged.append((frozenset(tags), cache))
+
+
+def invalidate_tags(tags, source=None, user=None):
+    """
+    Invalida os caches registrados com alguma das `tags` e, nos loaders com
+    `eager`, agenda a atualização em segundo plano (das entradas compartilhadas
+    e das de `user`, quem fez a escrita). Retorna o registro da
+    invalidação, também guardado para o painel de desempenho (`invalidations`).
+    """
+    tags = set(tags)
+    evicted = {}
+    refreshed = 0
+    for cache_tags, cache in _tagged:
+        if not cache_tags & tags:
+            continue
+        evicted[cache.name] = cache.invalidate() or 0
+        metrics.increment('cache_eviction', evicted[cache.name], cache=cache.name)
+        if isinstance(cache, TaggedLoader) and cache.eager:
+            refreshed += cache.refresh(user)
+    record = {
+        'time': datetime.now().strftime('%H:%M:%S'),
+        'source': source,
+        'tags': ', '.join(sorted(tags)),
+        'evicted': sum(evicted.values()),
+        'caches': ', '.join(f'{name}: {count}' for name, count in evicted.items()),
+        'refreshing': refreshed,
+    }
+    _invalidation_log.appendleft(record)
+    return record
+
+
+def notify_write(endpoint, user=None):
+    """Invalida as tags afetadas por uma escrita (POST/PUT/DELETE) bem-sucedida de `user` em `endpoint`."""
+    tags = {tag for prefix, write_tags in WRITE_TAGS if endpoint.startswith(prefix) for tag in write_tags}
+    return invalidate_tags(tags, source=endpoint, user=user)
+
+
+def invalidations():
+    """Invalidações mais recentes primeiro, com as entradas descartadas por cache."""
+    return list(_invalidation_log)
+
+
+enrollment_cache = QueryCache('enrollment', shared=cache_store.namespace('enrollment'))
+# Inscrições podem trazer o nome da turma e o semestre ativo
+register(enrollment_cache, 'enrollments', 'turmas', 'config')
+
+# Consultas do painel, guardadas no backend e vistas por todas as réplicas
+semesters_loader = TaggedLoader('semesters', ('semesters',))
+turmas_loader = TaggedLoader('turmas', ('turmas',))
+config_loader = TaggedLoader('config', ('config',), per_user=True)
+users_loader = TaggedLoader('users', ('users',), per_user=True)
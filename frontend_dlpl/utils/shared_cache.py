@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from os import getenv
+
+from utils import concurrency, metrics, query_cache
+from utils.cache_backend import cache_store
+
+PUBLIC_CACHE_TTL = float(getenv('PUBLIC_CACHE_TTL', '30'))
+PUBLIC_CACHE_STALE = float(getenv('PUBLIC_CACHE_STALE', '300'))
+
+
+class SharedCache:
+    """
+    Cache compartilhado entre todas as sessões, para respostas públicas (iguais
+    para todos os alunos). As respostas ficam em `namespace`, no backend do
+    `cache_store`: com um backend compartilhado, uma réplica aproveita o que
+    outra já buscou e as invalidações valem para todas.
+
+    - Dentro do `ttl` a resposta é servida direto do cache.
+    - Até `ttl + stale` a resposta antiga é servida e uma atualização é
+      disparada em segundo plano (stale-while-revalidate).
+    - Buscas simultâneas da mesma chave são agrupadas em uma única chamada
+      (single-flight): as demais sessões do processo esperam o resultado da primeira.
+    """
+
+    def __init__(self, namespace, ttl=PUBLIC_CACHE_TTL, stale=PUBLIC_CACHE_STALE):
+        self.name = namespace.name
+        self.ttl = ttl
+        self.stale = stale
+        self._entries = namespace
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._counters = defaultdict(
+            lambda: {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0, 'refreshes': 0, 'errors': 0}
+        )
+
+    def _run(self, key, fetch, future):
+        try:
+            with metrics.cache_scope(f'public:{key}'):
+                value = fetch()
+            # Guardada por `ttl + stale`; depois disso o backend a descarta sozinho
+            self._entries.set(key, value, self.ttl + self.stale)
+        except Exception as e:
+            with self._lock:
+                self._counters[key]['errors'] += 1
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def get(self, key, fetch):
+        """Retorna o valor de `key`, chamando `fetch()` apenas quando necessário."""
+        start = time.perf_counter()
+        entry = self._entries.get(key)
+        age = entry[1] if entry else None
+        with self._lock:
+            counters = self._counters[key]
+            if entry and age < self.ttl:
+                counters['hits'] += 1
+                metrics.observe('cache_lookup', time.perf_counter() - start, cache=f'public:{key}', result='hit')
+                return entry[0]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+            if entry and age < self.ttl + self.stale:
+                counters['stale_hits'] += 1
+                if leader:
+                    counters['refreshes'] += 1
+                    concurrency.submit(self._run, key, fetch, future)
+                metrics.observe('cache_lookup', time.perf_counter() - start, cache=f'public:{key}', result='stale')
+                return entry[0]
+
+            if leader:
+                counters['misses'] += 1
+            else:
+                counters['coalesced'] += 1
+
+        with metrics.timer('cache_lookup', cache=f'public:{key}', result='miss' if leader else 'coalesced'):
+            if leader:
+                self._run(key, fetch, future)
+            return future.result()
+
+    def invalidate(self, key=None):
+        """Descarta `key` (ou todas as respostas) e retorna quantas estavam em cache."""
+        if key is not None:
+            evicted = int(self._entries.get(key) is not None)
+            self._entries.delete(key)
+            return evicted
+        with self._lock:
+            keys = list(self._counters)
+        evicted = sum(self._entries.get(key) is not None for key in keys)
+        self._entries.invalidate()
+        return evicted
+
+    def stats(self):
+        """Idade da resposta em cache e contadores de cada chave, para acompanhamento."""
+        with self._lock:
+            counters_by_key = {key: dict(counters) for key, counters in self._counters.items()}
+        rows = []
+        for key, counters in counters_by_key.items():
+            entry = self._entries.get(key)
+            served = counters['hits'] + counters['stale_hits'] + counters['coalesced']
+            lookups = served + counters['misses']
+            rows.append(
+                {
+                    'key': key,
+                    'age_seconds': round(entry[1], 1) if entry else None,
+                    **counters,
+                    'hit_ratio': round(served / lookups, 3) if lookups else 0.0,
+                }
+            )
+        return rows
+
+
+public_cache = SharedCache(cache_store.namespace('public'))
+
+# Turmas e configuração alteradas no painel administrativo mudam as respostas públicas
+query_cache.register(public_cache, 'turmas', 'config')
@@ -0,0 +1,64 @@
+import base64
+import hashlib
+import mimetypes
+import re
+from functools import cache
+from pathlib import Path
+
+import streamlit as st
+
+# Pasta servida pelo Streamlit em `app/static/` quando `server.enableStaticServing` está ativo
+STATIC_DIR = Path(__file__).resolve().parent.parent / 'static'
+STATIC_URL = 'app/static'
+
+
+# --- FUNÇÕES HELPER ---
+@cache
+def load_asset(name):
+    """Lê um arquivo de `static/` uma única vez por processo e retorna (bytes, fingerprint)."""
+    data = (STATIC_DIR / name).read_bytes()
+    return data, hashlib.sha256(data).hexdigest()[:12]
+
+
+@cache
+def asset_url(name):
+    """
+    Retorna a URL de um arquivo estático.
+
+    Com o static serving do Streamlit ativo, retorna `app/static/<arquivo>?v=<fingerprint>`;
+    o parâmetro `v` faz o Tornado responder com cache de longa duração e muda
+    sempre que o conteúdo do arquivo muda. Sem static serving, cai para um data URI
+    codificado uma única vez por processo.
+    """
+    data, fingerprint = load_asset(name)
+    if st.get_option('server.enableStaticServing'):
+        return f'{STATIC_URL}/{name}?v={fingerprint}'
+    mime_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return f'data:{mime_type};base64,{base64.b64encode(data).decode()}'
+
+
+@cache
+def stylesheet(name):
+    """Retorna o CSS de `static/` minificado dentro de uma tag <style>, calculado uma vez por processo."""
+    data, fingerprint = load_asset(name)
+    css = re.sub(r'/\*.*?\*/', '', data.decode(), flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css).strip()
+    return f'<style data-asset="{fingerprint}">{css}</style>'
+
+
+def load_css(name):
+    """Injeta o CSS customizado da página, adaptado aos temas claro e escuro do Streamlit."""
+    st.markdown(stylesheet(name), unsafe_allow_html=True)
+
+
+def show_logo():
+    """Adiciona a logo ao topo da página, referenciando o arquivo estático."""
+    try:
+        logo_url = asset_url('logo.png')
+    except FileNotFoundError:
+        return
+    st.markdown(
+        f'<div class="logo-container"><img src="{logo_url}" class="logo-img"></div>',
+        unsafe_allow_html=True,
+    )
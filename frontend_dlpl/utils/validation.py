@@ -0,0 +1,45 @@
+import re
+from functools import lru_cache
+
+from unidecode import unidecode
+
+NAME_CACHE_SIZE = 4096
+
+
+def remover_numeros_e_acentos_unidecode(text):
+    """Limpa o texto, removendo números e acentos, e converte para maiúsculas."""
+    text_sem_numeros = re.sub(r'\d+', '', text)
+    text_limpa = unidecode(text_sem_numeros)
+    return text_limpa.upper()
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def normalize_name(name):
+    """
+    Nome no formato esperado pela API: sem números nem acentos, em maiúsculas e
+    com espaços repetidos ou nas pontas removidos. Memoizado, pois o mesmo nome
+    é normalizado a cada rerun e a cada nova tentativa de verificação.
+    """
+    return ' '.join(remover_numeros_e_acentos_unidecode(name).split())
+
+
+def normalize_cpf(cpf):
+    """Mantém só os dígitos do CPF digitado (aceita com ou sem pontos e traço)."""
+    return re.sub(r'\D', '', cpf or '')
+
+
+def cpf_is_valid(digits):
+    """Confere o tamanho e os dois dígitos verificadores de um CPF só com dígitos."""
+    if len(digits) != 11 or digits == digits[0] * 11:
+        return False
+    numbers = [int(digit) for digit in digits]
+    for position in (9, 10):
+        total = sum(number * (position + 1 - index) for index, number in enumerate(numbers[:position]))
+        if (total * 10 % 11) % 10 != numbers[position]:
+            return False
+    return True
+
+
+def format_cpf(digits):
+    """Formata 11 dígitos como 000.000.000-00."""
+    return f'{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}'
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do app são importados como `utils.*`, a partir de frontend_dlpl/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'frontend_dlpl'))
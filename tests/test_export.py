@@ -0,0 +1,21 @@
+import pandas as pd
+import pyarrow.parquet as pq
+from utils import export
+
+
+def test_write_parquet_mixed_types(tmp_path):
+    # `nota_predita` chega da API com notas e com o 'N/A' padrão da página de inscrição
+    df = pd.DataFrame(
+        {
+            'nome': ['ALUNO 1', 'ALUNO 2', 'ALUNO 3'],
+            'turma': ['Turma A', None, 'Turma B'],
+            'nota_predita': [7.5, 'N/A', None],
+        }
+    )
+    target = tmp_path / 'inscricoes.parquet'
+    export.write_parquet(df, target)
+
+    table = pq.read_table(target)
+    assert table.column('nota_predita').to_pylist() == ['7.5', 'N/A', None]
+    assert table.column('nome').to_pylist() == df['nome'].tolist()
+    assert df['nota_predita'].dtype == object